@@ -0,0 +1,105 @@
+import os
+import queue
+import atexit
+import threading
+from metrics import timer
+
+class NullBackend:
+    """
+    Plays nothing. Used on headless kiosks, in tests, or when there's no audio device.
+    """
+    def play(self, file_path:str) -> None:
+        pass
+
+    def speak(self, text:str) -> None:
+        pass
+
+
+class PygameBackend:
+    """
+    Sounds through 'pygame' and speech through 'pyttsx3'. The mixer and the speech engine are created once,
+    and every sound in 'preload' is decoded up front so playing it is instant.
+    """
+    def __init__(self, preload:list[str]):
+        import warnings
+        warnings.filterwarnings(action="ignore", module="pygame.pkgdata")
+        os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+        import pygame
+        import pyttsx3
+
+        pygame.mixer.init()
+        self.sounds = {file_path: pygame.mixer.Sound(file_path) for file_path in preload}
+        self.pygame = pygame
+
+        self.engine = pyttsx3.init()
+        self.engine.setProperty('rate', 150)  # Words per minute
+
+    def play(self, file_path:str) -> None:
+        if file_path not in self.sounds:
+            self.sounds[file_path] = self.pygame.mixer.Sound(file_path)
+        self.sounds[file_path].play()
+
+    def speak(self, text:str) -> None:
+        self.engine.say(text)
+        self.engine.runAndWait()
+
+
+class AudioService:
+    """
+    Long-lived audio thread. 'play' and 'speak' only queue a command and return, so the prompt never waits for audio.
+    The backend is built inside the thread, since speech engines expect to be used from the thread that created them.
+    """
+    SOUNDS = ["sounds/cash_register.mp3", "sounds/receipt.mp3"]
+
+    def __init__(self, silent:bool=False):
+        self.silent = silent
+        self.commands = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def play(self, file_path:str) -> None:
+        self.commands.put(("play", file_path))
+
+    def speak(self, text:str) -> None:
+        self.commands.put(("speak", text))
+
+    def stop(self, timeout:float=3) -> None:
+        """
+        Lets queued audio finish (up to 'timeout' seconds) and ends the thread
+        """
+        self.commands.put(None)
+        self.thread.join(timeout)
+
+    def _build_backend(self):
+        if self.silent:
+            return NullBackend()
+        try:
+            return PygameBackend(preload=self.SOUNDS)
+        except Exception:
+            # No audio device (or no audio libraries), stay silent instead of breaking the app
+            return NullBackend()
+
+    def _run(self) -> None:
+        backend = self._build_backend()
+        while (command := self.commands.get()) is not None:
+            action, argument = command
+            try:
+                # 'audio_play' and 'audio_speak'
+                with timer(f"audio_{action}"):
+                    getattr(backend, action)(argument)
+            except Exception:
+                # A sound that can't be played is never worth interrupting an order
+                pass
+
+
+_audio = None
+
+def get_audio() -> AudioService:
+    """
+    Returns the audio service. Set 'HARVOFFE_AUDIO=off' to run silently (i.e: headless kiosks).
+    """
+    global _audio
+    if _audio is None:
+        _audio = AudioService(silent=os.environ.get("HARVOFFE_AUDIO", "on") == "off")
+        atexit.register(_audio.stop)
+    return _audio
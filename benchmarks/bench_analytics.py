@@ -0,0 +1,80 @@
+"""
+Row-by-row reports against the columnar ones, over the whole order history and over a 30 days window.
+
+Usage: python benchmarks/bench_analytics.py [--sizes 100000 1000000] [--repeat 3] [--output FILE]
+
+The row-by-row path is 'reports.py': every order is read from 'orders.csv' and its items are parsed with 'json.loads'.
+The columnar path runs on the columns written by 'columnar.compact' (which is timed too, it runs offline). Needs NumPy.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+
+# Run from anywhere, the app modules live one directory up
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import storage
+from columnar import compact, OrderColumns
+from reports import SalesReport, parse_orders
+from utils import render_table
+from bench_storage import generate
+
+# 'generate' places orders 30 seconds apart from Jan 01, 2025
+WINDOW = ("2025-01-05", "2025-02-03")
+
+def best_of(repeat:int, function) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(min(timings), 1)
+
+def row_by_row(since:str | None=None, until:str | None=None) -> dict:
+    orders = parse_orders(storage.get_storage().stream("orders"))
+    if since:
+        orders = (order for order in orders if since <= order["day"] <= until)
+    return SalesReport().consume(orders).reports()
+
+def bench(rows:int, repeat:int) -> list[dict]:
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        generate(directory, rows)
+        os.chdir(directory)
+        try:
+            storage.set_storage(storage.CSVStorage())
+            compact_ms = best_of(1, compact)
+            columns = OrderColumns()
+            return [
+                {"rows": rows, "window": "all", "row_by_row_ms": best_of(repeat, row_by_row), "columnar_ms": best_of(repeat, columns.reports), "compact_ms": compact_ms},
+                {"rows": rows, "window": "30 days", "row_by_row_ms": best_of(repeat, lambda: row_by_row(*WINDOW)), "columnar_ms": best_of(repeat, lambda: columns.reports(*WINDOW)), "compact_ms": compact_ms},
+            ]
+        finally:
+            os.chdir(cwd)
+
+def main():
+    parser = argparse.ArgumentParser(description="Row-by-row against columnar order analytics")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=os.path.join(ROOT, "benchmarks", "results", f"analytics-{datetime.now():%Y%m%d-%H%M%S}.json"))
+    args = parser.parse_args()
+
+    results = []
+    for rows in args.sizes:
+        for result in bench(rows, args.repeat):
+            result["speedup"] = round(result["row_by_row_ms"] / result["columnar_ms"], 1) if result["columnar_ms"] else None
+            results.append(result)
+    print(render_table(results))
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as file:
+        json.dump({"date": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(), "platform": platform.platform(), "results": results}, file, indent=2)
+    print(f"\nResults saved in '{args.output}'")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Login latency at each bcrypt cost factor.
+
+Usage: python benchmarks/bench_login.py [--costs 8 10 12] [--logins 50] [--concurrency 1]
+
+Every login is a bcrypt check through the same worker pool the app uses ('Auth.check_password').
+With '--concurrency' N, N kiosks log in at the same time, which is what p99 looks like during rush hour.
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+# Run from anywhere, the app modules live one directory up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from classes.auth import Auth
+from utils import render_table
+
+PASSWORD = "Harvoffe123!"
+
+def percentile(samples:list[float], percent:float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, round(percent / 100 * (len(samples) - 1)))]
+
+def login(hashed_password:str) -> float:
+    start = time.perf_counter()
+    assert Auth.check_password(PASSWORD, hashed_password)
+    return (time.perf_counter() - start) * 1000
+
+def bench(cost:int, logins:int, concurrency:int) -> dict:
+    hashed_password = Auth.hash_password_async(PASSWORD, cost).result()
+    with ThreadPoolExecutor(max_workers=concurrency) as kiosks:
+        latencies = list(kiosks.map(login, [hashed_password] * logins))
+
+    return {
+        "cost": cost,
+        "logins": logins,
+        "concurrency": concurrency,
+        "p50_ms": round(statistics.median(latencies), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Login latency at each bcrypt cost factor")
+    parser.add_argument("--costs", type=int, nargs="+", default=[8, 10, 12])
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+
+    print(render_table([bench(cost, args.logins, args.concurrency) for cost in args.costs]))
+
+if __name__ == "__main__":
+    main()
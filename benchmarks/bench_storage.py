@@ -0,0 +1,221 @@
+"""
+Storage and checkout hot paths at 1k, 100k and 1M rows.
+
+Usage: python benchmarks/bench_storage.py [--sizes 1000 100000 1000000] [--repeat 50] [--output FILE] [--compare OLD_FILE]
+
+For each size, synthetic 'users.csv', 'orders.csv' and 'carts.csv' files with that many rows are generated in a temporary
+directory, and every operation runs there against a fresh store (the backend is chosen with 'HARVOFFE_STORAGE', like the app):
+
+    get_balance                 User.get_balance
+    check_if_email_is_in_use    Auth.check_if_email_is_in_use
+    get_user_cart               Cart.get_user_cart
+    update_quantity             Cart.update_quantity (adds one item, then saves the cart)
+    pay                         OrderService.pay, which is what 'Cart.pay' runs once the user confirms
+    get_user_orders             Order.get_user_orders (first page)
+
+'cold_ms' is the first call, which includes loading the files. p50/p99 are taken over the next '--repeat' calls.
+Results are saved as JSON (benchmarks/results/storage-<date>.json by default). With '--compare', every operation is checked
+against an older results file, and the script exits with 1 if any of them got more than '--threshold' times slower
+(and at least '--min-ms' slower, so microsecond lookups don't flag noise). The 1M rows run takes a while, mostly in 'pay'.
+"""
+import os
+import sys
+import csv
+import json
+import time
+import uuid
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import contextlib
+from datetime import datetime, timedelta
+
+# Run from anywhere, the app modules live one directory up
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import storage
+import order_log
+import cart_buffer
+import email_index
+import ledger
+from classes import menu
+from classes.auth import Auth
+from classes.user import User
+from classes.cart import Cart
+from classes.order import Order
+from classes.order_service import OrderService
+from utils import render_table, read_csv
+
+# One hash shared by every synthetic user, bcrypt isn't what's measured here
+PASSWORD_HASH = "$2b$04$4rZgC2yRYeJjUOuoS9sV5uTb0bN1iQ7eqB5iK0vZJxQ2d9l9cJ2zO"
+
+def percentile(samples:list[float], percent:float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, round(percent / 100 * (len(samples) - 1)))]
+
+def generate(directory:str, rows:int, seed:int=50) -> list[dict]:
+    """
+    Writes 'rows' users, orders and carts into 'directory'. Returns the users (without password) to pick from.
+    Rows are written one at a time, so generating 1M of them never holds them all in memory.
+    """
+    rng = random.Random(seed)
+    coffees = read_csv(os.path.join(ROOT, "menu.csv"))
+    shutil.copy(os.path.join(ROOT, "menu.csv"), directory)
+
+    users = []
+    with open(os.path.join(directory, "users.csv"), "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(storage.TABLES["users"]["headers"])
+        for i in range(rows):
+            user = {"first": f"First{i}", "last": f"Last{i}", "email": f"user{i}@harvoffe.test", "card_id": str(uuid.UUID(int=rng.getrandbits(128), version=4))}
+            # Plenty of balance, so 'pay' never runs out
+            writer.writerow([user["first"], user["last"], user["email"], PASSWORD_HASH, user["card_id"], 1_000_000])
+            users.append(user)
+
+    def items() -> list[dict]:
+        return [{"coffee": coffee["coffee"], "price": float(coffee["price"]), "quantity": rng.randint(1, 3)} for coffee in rng.sample(coffees, rng.randint(1, 3))]
+
+    start = datetime(2025, 1, 1)
+    with open(os.path.join(directory, "orders.csv"), "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(storage.TABLES["orders"]["headers"])
+        for i in range(rows):
+            user = users[rng.randrange(rows)]
+            lines = items()
+            total = round(sum(line["price"] * line["quantity"] for line in lines), 2)
+            date = (start + timedelta(seconds=i * 30)).strftime("%b %d, %Y %H:%M:%S")
+            writer.writerow([f"{i:08X}", user["card_id"], f"{user['first']} {user['last']}", date, total, json.dumps(lines)])
+
+    with open(os.path.join(directory, "carts.csv"), "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(storage.TABLES["carts"]["headers"])
+        for user in users:
+            writer.writerow([user["card_id"], json.dumps(items())])
+
+    return users
+
+def reset() -> None:
+    """
+    Drops every singleton, so the next call loads the files of the current directory
+    """
+    if os.environ.get("HARVOFFE_STORAGE", "csv") == "sqlite":
+        target = storage.SQLiteStorage("harvoffe.db")
+        storage.migrate(storage.CSVStorage(), target)
+        storage.set_storage(target)
+    else:
+        storage.set_storage(storage.CSVStorage())
+    order_log._order_log = None
+    cart_buffer._cart_buffer = None
+    email_index._email_index = None
+    ledger._ledger = None
+    menu._menu = None
+
+def measure(operation, users:list[dict], repeat:int, rng:random.Random) -> dict:
+    timings = []
+    for _ in range(repeat + 1):
+        user = users[rng.randrange(len(users))]
+        start = time.perf_counter()
+        operation(user)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "cold_ms": round(timings[0], 3),
+        "p50_ms": round(statistics.median(timings[1:]), 3),
+        "p99_ms": round(percentile(timings[1:], 99), 3),
+    }
+
+def pay(user:dict) -> None:
+    service = OrderService(user["card_id"])
+    service.add_item("Latte", 1)
+    service.pay(client=f"{user['first']} {user['last']}")
+
+OPERATIONS = {
+    "get_balance": lambda user: User.get_balance(user["card_id"]),
+    "check_if_email_is_in_use": lambda user: Auth.check_if_email_is_in_use(user["email"]),
+    "get_user_cart": lambda user: Cart.get_user_cart(user["card_id"]),
+    "update_quantity": lambda user: Cart(user["card_id"], [{"coffee": "Latte", "price": 4.5, "quantity": 1}]).update_quantity("Latte", 1, True),
+    "pay": pay,
+    "get_user_orders": lambda user: Order.get_user_orders(user["card_id"]),
+}
+
+def bench(rows:int, repeat:int) -> list[dict]:
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        users = generate(directory, rows)
+        os.chdir(directory)
+        try:
+            reset()
+            rng = random.Random(rows)
+            for name, operation in OPERATIONS.items():
+                # The app prints its own feedback, which is not what's measured
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                    results.append({"rows": rows, "operation": name, **measure(operation, users, repeat, rng)})
+            cart_buffer.get_cart_buffer().flush()
+        finally:
+            os.chdir(cwd)
+    return results
+
+def compare(results:list[dict], old_file:str, threshold:float, min_ms:float) -> list[dict]:
+    """
+    p50 of every operation against the same operation (and size) in an older results file
+    """
+    with open(old_file, "r") as file:
+        old = {(result["rows"], result["operation"]): result for result in json.load(file)["results"]}
+
+    comparison = []
+    for result in results:
+        if (before := old.get((result["rows"], result["operation"]))) is None:
+            continue
+        ratio = result["p50_ms"] / before["p50_ms"] if before["p50_ms"] else 1.0
+        comparison.append({
+            "rows": result["rows"],
+            "operation": result["operation"],
+            "old_p50_ms": before["p50_ms"],
+            "p50_ms": result["p50_ms"],
+            "ratio": round(ratio, 2),
+            "regression": ratio > threshold and result["p50_ms"] - before["p50_ms"] > min_ms,
+        })
+    return comparison
+
+def main():
+    parser = argparse.ArgumentParser(description="Storage and checkout hot paths at several data sizes")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--output", default=os.path.join(ROOT, "benchmarks", "results", f"storage-{datetime.now():%Y%m%d-%H%M%S}.json"))
+    parser.add_argument("--compare", help="Older results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.5, help="Slowdown ratio that counts as a regression")
+    parser.add_argument("--min-ms", type=float, default=0.05, help="Smallest p50 slowdown (ms) that counts as a regression")
+    args = parser.parse_args()
+
+    # No sounds, nothing but storage and checkout is measured
+    os.environ.setdefault("HARVOFFE_AUDIO", "off")
+
+    results = []
+    for rows in args.sizes:
+        results.extend(bench(rows, args.repeat))
+    print(render_table(results))
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as file:
+        json.dump({
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "storage": os.environ.get("HARVOFFE_STORAGE", "csv"),
+            "repeat": args.repeat,
+            "results": results,
+        }, file, indent=2)
+    print(f"\nResults saved in '{args.output}'")
+
+    if args.compare:
+        comparison = compare(results, args.compare, args.threshold, args.min_ms)
+        print(render_table(comparison))
+        if any(row["regression"] for row in comparison):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Load generator for the order server ('python project.py --serve').
+
+Usage: python benchmarks/loadgen.py --email EMAIL --password PASSWORD [--address 127.0.0.1:8750] [--clients 50] [--requests 100] [--pay]
+
+Every client logs in once, then keeps sending order, cart and history requests over its own connection,
+each one waiting for the previous answer, like a kiosk would. With '--pay', every client pays its cart at the end
+(the account needs enough balance for it).
+All clients share the account's cart, so a few deletes and payments are expected to fail when they interleave.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+# Run from anywhere, the app modules live one directory up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import render_table
+
+REQUESTS = [
+    {"op": "order", "command": "Latte -q 1"},
+    {"op": "cart"},
+    {"op": "order", "command": "Latte -d 1"},
+    {"op": "history", "page": 1},
+]
+
+def percentile(samples:list[float], percent:float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, round(percent / 100 * (len(samples) - 1)))]
+
+async def send(reader:asyncio.StreamReader, writer:asyncio.StreamWriter, request:dict) -> dict:
+    writer.write((json.dumps(request) + "\n").encode("utf-8"))
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+async def client(host:str, port:int, args, latencies:list[float], errors:list[str]) -> None:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        response = await send(reader, writer, {"op": "auth", "email": args.email, "password": args.password})
+        if not response["ok"]:
+            return errors.append(response["error"])
+        token = response["token"]
+
+        requests = [REQUESTS[i % len(REQUESTS)] for i in range(args.requests)]
+        if args.pay:
+            requests[-1] = {"op": "pay"}
+            requests[-2] = {"op": "order", "command": "Latte -q 1"}
+
+        for request in requests:
+            start = time.perf_counter()
+            response = await send(reader, writer, {**request, "token": token})
+            latencies.append((time.perf_counter() - start) * 1000)
+            if not response["ok"]:
+                errors.append(response["error"])
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+async def run(args) -> dict:
+    host, port = args.address.rsplit(":", 1)
+    latencies, errors = [], []
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client(host, int(port), args, latencies, errors) for _ in range(args.clients)])
+    elapsed = time.perf_counter() - start
+
+    return {
+        "clients": args.clients,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "requests/s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99), 2) if latencies else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent clients against the order server")
+    parser.add_argument("--address", default="127.0.0.1:8750")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=100, help="Requests per client, after logging in")
+    parser.add_argument("--pay", action="store_true")
+    args = parser.parse_args()
+
+    print(render_table([asyncio.run(run(args))]))
+
+if __name__ == "__main__":
+    main()
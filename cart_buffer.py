@@ -0,0 +1,100 @@
+import os
+import json
+import time
+import atexit
+from storage import get_storage
+from order_lines import encode_cart
+
+class CartBuffer:
+    """
+    Write-behind layer for 'carts.csv'. Cart changes are kept in memory and written to the store in batches:
+    on exit, on pay, or once 'flush_interval' seconds or 'max_pending' dirty carts are reached.
+
+    Every change is also appended to a small journal before being acknowledged, so if the app crashes
+    before a flush the pending carts are replayed from the journal the next time it starts.
+    """
+    def __init__(self, journal:str="carts.journal", flush_interval:float=30.0, max_pending:int=50):
+        self.journal = journal
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending:dict[str, list | None] = {}  # card_id -> cart (None means the cart was deleted)
+        self.last_flush = time.monotonic()
+        self.recover()
+
+    def get(self, card_id:str) -> list | None:
+        """
+        Returns the buffered cart, [] if it was deleted, or None if there's nothing buffered for that user
+        """
+        if card_id not in self.pending:
+            return None
+        return self.pending[card_id] or []
+
+    def set(self, card_id:str, cart:list) -> None:
+        self._record(card_id, cart)
+
+    def delete(self, card_id:str) -> None:
+        self._record(card_id, None)
+
+    def _record(self, card_id:str, cart:list | None) -> None:
+        # Journal first, so the change survives a crash
+        with open(self.journal, "a") as file:
+            file.write(json.dumps({"card_id": card_id, "cart": cart}) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+        self.pending[card_id] = cart
+
+        if len(self.pending) >= self.max_pending or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Writes every pending cart into the store and empties the journal
+        """
+        storage = get_storage()
+        for card_id, cart in self.pending.items():
+            if cart is None:
+                storage.delete("carts", "card_id", card_id)
+            elif not storage.update("carts", "card_id", card_id, {"cart": encode_cart(cart)}):
+                # Cart didn't exist in 'carts.csv' (or 'carts.csv' didn't exist), so we add it
+                storage.insert("carts", {"card_id": card_id, "cart": encode_cart(cart)})
+
+        self.pending = {}
+        self.last_flush = time.monotonic()
+        if os.path.exists(self.journal):
+            os.remove(self.journal)
+
+    def recover(self) -> None:
+        """
+        Replays the journal left behind by a session that didn't get to flush
+        """
+        if not os.path.exists(self.journal):
+            return
+
+        with open(self.journal, "r") as file:
+            for line in file:
+                try:
+                    change = json.loads(line)
+                except json.JSONDecodeError:
+                    # Last line may be half written if the crash happened mid-write
+                    continue
+                self.pending[change["card_id"]] = change["cart"]
+
+        self.flush()
+
+
+_cart_buffer = None
+
+def get_cart_buffer() -> CartBuffer:
+    global _cart_buffer
+    if _cart_buffer is None:
+        # Each terminal journals into its own file, so flushing one kiosk never drops another kiosk's pending carts
+        terminal = os.environ.get("HARVOFFE_TERMINAL", "default")
+        _cart_buffer = CartBuffer(
+            journal=f"carts.{terminal}.journal",
+            flush_interval=float(os.environ.get("HARVOFFE_CART_FLUSH_INTERVAL", 30)),
+            max_pending=int(os.environ.get("HARVOFFE_CART_FLUSH_SIZE", 50)),
+        )
+        # Whatever is still pending is written when the app exits
+        atexit.register(_cart_buffer.flush)
+    return _cart_buffer
@@ -1,10 +1,30 @@
+import os
 import uuid
-from utils import send_email, colored_text, read_csv
-import bcrypt
+from concurrent.futures import Future, ThreadPoolExecutor
+from utils import send_email, colored_text
+from storage import get_storage
+from metrics import timed
+from email_index import get_email_index
 
 class Auth:
+    # bcrypt cost factor for new hashes. Stored hashes with a different cost are rehashed on the next login
+    BCRYPT_COST = int(os.environ.get("HARVOFFE_BCRYPT_COST", 12))
+    _pool = None
+
+    @classmethod
+    def pool(cls) -> ThreadPoolExecutor:
+        """
+        Worker pool where bcrypt runs. bcrypt releases the GIL, so hashing never holds up the rest of the app.
+        """
+        if cls._pool is None:
+            cls._pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 2, thread_name_prefix="bcrypt")
+        return cls._pool
+
     @staticmethod
-    def send_verification_code(send_to:str) -> int:
+    def send_verification_code(send_to:str, announce:bool=True) -> int:
+        """
+        Emails a new verification code to the user and returns it ('announce' tells the user at the terminal to check their email)
+        """
         code = uuid.uuid4().hex[:6].upper()
         message = {}
         message["Subject"] = "Harvoffe Registration Code"
@@ -20,7 +40,8 @@ class Auth:
         
         message["Body"] = body
         if code_sent := send_email(message):
-            print(colored_text("A verification code has been sent to your email, please retrieve it and type it below!", "alert"))
+            if announce:
+                print(colored_text("A verification code has been sent to your email, please retrieve it and type it below!", "alert"))
             return code
     
     @staticmethod
@@ -44,25 +65,70 @@ class Auth:
     @staticmethod
     def check_if_email_is_in_use(email:str) -> bool:
         """
-        Searchs for existing accounts linked to the email received
+        Searchs for existing accounts linked to the email received (in any case, 'David@Harvard.edu' is 'david@harvard.edu').
+        Returns True if the email is free
         """
-        users = read_csv("users.csv")
-        return True if not [user for user in users if user["email"] == email] else False
+        return not get_email_index().contains(email)
+
+    @classmethod
+    def hash_password(cls, password:str) -> str:
+        return cls.hash_password_async(password).result()
+
+    @classmethod
+    def hash_password_async(cls, password:str, cost:int | None=None) -> Future:
+        return cls.pool().submit(cls._hash_password, password, cost or cls.BCRYPT_COST)
 
     @staticmethod
-    def hash_password(password:str) -> str:
+    @timed("hash_password")
+    def _hash_password(password:str, cost:int) -> str:
+        # 'bcrypt' is imported on first use, keeping it out of the app startup
+        import bcrypt
         password_bytes = password.encode('utf-8')
         # 1. Generate salt and hash
-        salt = bcrypt.gensalt()
+        salt = bcrypt.gensalt(rounds=cost)
         hashed_password_bytes = bcrypt.hashpw(password_bytes, salt)
         # 2. Decode the bytes object into a string for storage
         return hashed_password_bytes.decode('utf-8')
 
+    @classmethod
+    def check_password(cls, password:str, hashed_password:str) -> bool:
+        return cls.check_password_async(password, hashed_password).result()
+
+    @classmethod
+    def check_password_async(cls, password:str, hashed_password:str) -> Future:
+        return cls.pool().submit(cls._check_password, password, hashed_password)
+
+    @classmethod
+    def needs_rehash(cls, hashed_password:str) -> bool:
+        """
+        True if the hash was made with a cost other than the configured one ('$2b$12$...' -> 12)
+        """
+        try:
+            return int(hashed_password.split("$")[2]) != cls.BCRYPT_COST
+        except (IndexError, ValueError):
+            return False
+
+    @classmethod
+    def rehash_in_background(cls, card_id:str, password:str) -> Future:
+        """
+        Hashes the password again with the configured cost and stores it, without making the user wait.
+        The returned future is done once the new hash is stored.
+        """
+        def rehash() -> str:
+            hashed_password = cls._hash_password(password, cls.BCRYPT_COST)
+            # Runs in a bcrypt worker, the store serializes it with the app's own reads and writes
+            get_storage().update("users", "card_id", card_id, {"password": hashed_password})
+            return hashed_password
+
+        return cls.pool().submit(rehash)
+
     @staticmethod
-    def check_password(password:str, hashed_password:str) -> bool:
+    @timed("check_password")
+    def _check_password(password:str, hashed_password:str) -> bool:
         """
         Check if the pass received is equal to the hashed pass received
         """
+        import bcrypt
         try:
             # 1. Convert both the attempt and the stored hash to bytes (bcrypt requires bytes)
             password_bytes = password.encode('utf-8')
@@ -0,0 +1,93 @@
+import os
+import time
+from datetime import datetime
+from utils import colored_text, render_table
+from pickup_queue import get_pickup_queue, QueueError
+from order_ids import get_order_ids
+
+class Barista:
+    """
+    Barista-facing view of the pickup queue: what's waiting, what's being prepared, and the throughput of the last hour
+    """
+    REFRESH_SECONDS = 2
+
+    @classmethod
+    def table(cls) -> str:
+        queue = get_pickup_queue()
+        now = time.time()
+        rows = [
+            {
+                "pickup": order["pickup"],
+                "client": order["client"],
+                "status": "preparing" if order["status"] == "claimed" else "waiting",
+                "placed": datetime.fromtimestamp(order["placed"]).strftime("%H:%M:%S"),
+                "waiting": f"{int(now - order['placed']) // 60}m {int(now - order['placed']) % 60:02d}s",
+                "prep": f"{order['prep'] // 60}m {order['prep'] % 60:02d}s",
+            }
+            for order in queue.in_progress() + queue.waiting()
+        ]
+        stats = queue.stats(now)
+        summary = colored_text(
+            f"Waiting: {stats['queued']} | Preparing: {stats['in_progress']} | Last hour: {stats['orders_per_hour']} orders/hour, "
+            f"p95 wait {stats['wait_p95_s'] / 60:.1f} min",
+            "gray"
+        )
+        return "\n".join([render_table(rows) if rows else colored_text("No orders in the queue.", "gray"), summary])
+
+    @classmethod
+    def open(cls):
+        print(colored_text("\n*** Pickup Queue ***\n\nOrders are listed in the order they should be prepared. Type '-h' to see the shortcuts of this view.\n", "gray"))
+        barista = os.environ.get("HARVOFFE_TERMINAL", "default")
+        print(cls.table())
+
+        while True:
+            command, _, argument = input("Queue ('-e' to exit): ").strip().partition(" ")
+            # Baristas can type the pickup code or the order ID
+            order_id = get_order_ids().resolve(argument) if argument else None
+
+            try:
+                # Exit
+                if command in ["-e", "--exit"]:
+                    break
+
+                # Claim
+                elif command in ["-cl", "--claim"]:
+                    order = get_pickup_queue().claim(order_id, barista=barista)
+                    print(colored_text(f"\nPreparing {order['pickup']} for {order['client']}\n", "success"))
+
+                # Done
+                elif command in ["-dn", "--done"] and order_id:
+                    order = get_pickup_queue().complete(order_id)
+                    print(colored_text(f"\n{order['pickup']} is ready for {order['client']}!\n", "success"))
+
+                # Live view
+                elif command in ["-w", "--watch"]:
+                    cls.watch()
+
+                # Help
+                elif command in ["-h", "--help"]:
+                    print(colored_text("\nShortcuts of the pickup queue:\n\n  - To start preparing the next order: '-cl' (or a specific one, '-cl CODE')\n  - When an order is ready: '-dn CODE'\n  - To keep the queue on screen, refreshed every 2 seconds: '-w' (CTRL + C to stop)\n", "gray"))
+                    continue
+
+                else:
+                    continue
+            except QueueError as error:
+                print(colored_text(f"\n{error}\n", "error"))
+                continue
+
+            print(cls.table())
+
+    @classmethod
+    def watch(cls):
+        """
+        Keeps the queue on screen, refreshed every few seconds, until CTRL + C (i.e: a screen over the counter)
+        """
+        try:
+            while True:
+                # Clear the screen and go back to its top
+                print("\033[2J\033[H", end="")
+                print(colored_text(f"*** Pickup Queue *** {datetime.now():%H:%M:%S}\n", "gray"))
+                print(cls.table(), flush=True)
+                time.sleep(cls.REFRESH_SECONDS)
+        except KeyboardInterrupt:
+            print()
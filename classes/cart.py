@@ -1,9 +1,31 @@
-import json
-import re
-import uuid
-from tabulate import tabulate
-from datetime import datetime
-from utils import read_csv, colored_text, write_csv, append_csv, play_sound, title_keys
+from utils import colored_text, play_sound, render_table
+from storage import get_storage
+from cart_buffer import get_cart_buffer
+from order_lines import decode_cart
+from .order_service import OrderService, OrderError
+
+class CartLine:
+    """
+    One item of the cart. '__slots__' keeps every line small, since carts are rebuilt on each command.
+    """
+    __slots__ = ("coffee", "price", "quantity")
+
+    def __init__(self, coffee:str, price:float, quantity:int):
+        self.coffee = coffee
+        self.price = price
+        self.quantity = quantity
+
+    @property
+    def cents(self) -> int:
+        """
+        Unit price in cents, so totals can be kept without float drift
+        """
+        return round(self.price * 100)
+
+    def to_dict(self) -> dict:
+        # Same shape the cart has always had in 'carts.csv' and 'orders.csv'
+        return {"coffee": self.coffee, "price": self.price, "quantity": self.quantity}
+
 
 class Cart:
     def __init__(self, card_id, cart):
@@ -22,12 +44,39 @@ class Cart:
             self._card_id = card_id
     
     @property
-    def cart(self):
-        return self._cart
+    def cart(self) -> list[dict]:
+        return [line.to_dict() for line in self.lines.values()]
     
     @cart.setter
-    def cart(self, cart):
-        self._cart = cart
+    def cart(self, cart:list[dict]):
+        # Lines are keyed by coffee, so finding an item never needs to walk the whole cart
+        self.lines:dict[str, CartLine] = {}
+        self._total_cents = 0
+        for item in cart:
+            self.add(item["coffee"], item["price"], item["quantity"])
+
+    def add(self, coffee:str, price:float, quantity:int) -> CartLine:
+        """
+        Adds 'quantity' coffees to the cart, creating the line if it wasn't there yet
+        """
+        if (line := self.lines.get(coffee)) is None:
+            line = self.lines[coffee] = CartLine(coffee, price, 0)
+
+        line.quantity += quantity
+        self._total_cents += line.cents * quantity
+        return line
+
+    def remove(self, coffee:str, quantity:int) -> CartLine:
+        """
+        Removes 'quantity' coffees from the cart, deleting the line once it gets to 0
+        """
+        line = self.lines[coffee]
+        line.quantity -= quantity
+        self._total_cents -= line.cents * quantity
+
+        if line.quantity == 0:
+            del self.lines[coffee]
+        return line
 
     def open(self):
         while True:
@@ -46,69 +95,33 @@ class Cart:
                 print(colored_text("\nThis is your cart. You can update your items quantity with these shortcuts:\n\n  - To ADD an item: Use '-a' or '--add' (Macchiato -a 3)\n  - To DELETE an item: Use '-d' or '--delete' (Americano -d 1)\n  - To pay: Use '-p' or '--pay' (-p)\n", "gray"))
             
             # Validate user command
-            elif matches := re.search(r"^([a-zA-Z]+(?: [a-zA-Z]+)?) (-a|--add|-d|--delete) ([1-9]\d*)$", prompt):
-                coffee = matches.group(1).title()
-                is_addition = True if matches.group(2) in ["-a", "--add"] else False
-                quantity = int(matches.group(3))
-
-                found = [index for index, item in enumerate(self.cart) if item["coffee"] == coffee]
-                if found != []:
-                    found_index = found[0]
-                    self.update_quantity(index=found_index, quantity=quantity, is_addition=is_addition)
-                    continue
-                else:
-                    # Item is not in the cart
-                    print(colored_text(f"\nError: Could not find '{coffee}' in your cart!\n", "error"))
-                    continue
-            elif not matches:
-                print(colored_text("\nInvalid command. Expected format: 'Macchiato (-a|--add|-d|--delete) \\d'\n", "error"))
+            else:
+                try:
+                    coffee, quantity, is_addition = OrderService.parse_cart(prompt)
+                    self.update_quantity(coffee=coffee, quantity=quantity, is_addition=is_addition)
+                except OrderError as error:
+                    print(colored_text(f"\n{error}\n", "error"))
                 continue
     
-    def update_quantity(self, index:int, quantity:int, is_addition:bool):
-        # Update the cart and also update 'carts.csv'
-        carts:list = read_csv("carts.csv")
+    def update_quantity(self, coffee:str, quantity:int, is_addition:bool):
+        # Update the cart and also update 'carts.csv'. Raises 'OrderError' if the update isn't valid
         plural = "s" if quantity > 1 else ""
-        coffee_targeted = self.cart[index]["coffee"]
+        service = OrderService(self.card_id, cart=self)
+        line = service.modify(coffee, quantity, is_addition)
 
         if is_addition:
-            self.cart[index]["quantity"] += quantity
-            
-            success_txt = f"\n{quantity} {coffee_targeted + plural} has been added successfully! Currently in order: {self.cart[index]["quantity"]}\n"
-            print(colored_text(success_txt, "gray"))
-        elif is_addition is False:
-            # Not enough coffees to delete
-            if quantity > self.cart[index]["quantity"]:
-                error_txt = f"\nCould not delete {quantity} {coffee_targeted + plural} from your cart, you only have {self.cart[index]["quantity"]}\n"
-                print(colored_text(error_txt, "alert"))
-            else:
-                
-                if self.cart[index]["quantity"] - quantity == 0:
-                    # If substraction consequence is quantity being 0, update quantity and delete object from cart:
-                    self.cart = [obj for obj in self.cart if obj["coffee"] != coffee_targeted]
-                    
-                    success_txt = f"\n{quantity} {coffee_targeted + plural} has been deleted successfully! Currently in order: None\n"
-                    print(colored_text(success_txt, "gray"))
-                else:
-                    # If substraction consequence is not quantity being 0, just update quantity:
-                    self.cart[index]["quantity"] -= quantity
-                    success_txt = f"\n{quantity} {coffee_targeted + plural} has been deleted successfully! Currently in order: {self.cart[index]["quantity"]}\n"
-                    print(colored_text(success_txt, "gray"))
-                    
- 
-        # Update the cart in 'carts' with the updated version
-        for cart in carts:
-            if cart["card_id"] == self.card_id:
-                cart["cart"] = json.dumps(self.cart) # This is because 'cart' in 'carts.csv' expect a str in JSON format
+            success_txt = f"\n{quantity} {coffee + plural} has been added successfully! Currently in order: {line.quantity}\n"
+        else:
+            # If substraction consequence is quantity being 0, the line was deleted from the cart
+            in_order = line.quantity if line.quantity > 0 else None
+            success_txt = f"\n{quantity} {coffee + plural} has been deleted successfully! Currently in order: {in_order}\n"
+        print(colored_text(success_txt, "gray"))
 
-        # Rewrite entire 'carts.csv' to keep the user cart updated and persistant
-        write_csv(file="carts.csv", rows=carts, headers=["card_id", "cart"])
+        service.save()
 
     def get_total(self):
-        total = 0
-        for item in self.cart:
-            total += (item["price"] * item["quantity"])
-        
-        return round(total, 2)
+        # Kept up to date by 'add' and 'remove', so there's nothing to recompute here
+        return round(self._total_cents / 100, 2)
 
     def pay(self):
         # Break the circular import
@@ -120,7 +133,6 @@ class Cart:
             print(colored_text(f"Hey {user_session["first"]}! Ready for your coffee? Check everything is correct and if so, just type 'Y' to pay!\n", "gray"))
             total = self.get_total()
             user_balance = User.get_balance(user_session["card_id"])
-            enough_balance = True if user_balance >= total else False
 
             # Client
             print("Client:", user_session["first"])
@@ -132,46 +144,32 @@ class Cart:
             # Confirmation
             proceed = input("Pay? (Y/N) ").strip().upper()
             if proceed ==  "Y":
-                if enough_balance:
-                    try:
-                        # Modify user balance in 'users.csv' (Put inside User class 'update_balance')
-                        User.update_balance(user_session["card_id"], total)
-
-                        # Create order ID
-                        order_id = uuid.uuid4().hex[:6].upper()
-                        # Create order using 'Order' class
-                        Order.create(
-                            id=order_id,
-                            card_id=user_session["card_id"], 
-                            client=user_session["first"] + " " + user_session["last"],
-                            date=datetime.now().strftime("%b %d, %Y %H:%M:%S"),
-                            total=total,
-                            items=json.dumps(self.cart)
-                        )
-                        
-                        # Tell the user his purchase succeeded :)
-                        play_sound("sounds/cash_register.mp3")
-                        print(colored_text("\nYour order has been successfully processed!\n", "success"))
-                        print(colored_text(f"You can pick up your items at the Harvoffe store whenever you're ready.", "gray"))
-                        print(colored_text(f"Your order ID is:", "gray"), order_id, colored_text("(You will need this ID to claim your order)\n", "gray"))
-
-                        # Trash the cart
-                        self.trash()
-
-                        # Ask the user if he needs a ticket
-                        asked_for_ticket = input("Do you need a ticket? (Y/N) ").strip().upper()
-                        if asked_for_ticket == "Y":
-                            Order.request_ticket(order_id)
-
-                    except Exception as error:
-                        print(colored_text(str(error), "error"))
-                else:
-                    print(colored_text("\nYou don't have enough balance!\n", "error"))
+                try:
+                    # Update the balance, place the order and trash the cart
+                    order = OrderService(self.card_id, cart=self).pay(client=user_session["first"] + " " + user_session["last"])
+                    order_id = order["pickup"]
+
+                    # Make sure every cart change is written now that the order is placed
+                    get_cart_buffer().flush()
+                    
+                    # Tell the user his purchase succeeded :)
+                    play_sound("sounds/cash_register.mp3")
+                    print(colored_text("\nYour order has been successfully processed!\n", "success"))
+                    print(colored_text(f"You can pick up your items at the Harvoffe store whenever you're ready.", "gray"))
+                    print(colored_text(f"Your pickup code is:", "gray"), order_id, colored_text("(You will need this code to claim your order)\n", "gray"))
+
+                    # Ask the user if he needs a ticket
+                    asked_for_ticket = input("Do you need a ticket? (Y/N) ").strip().upper()
+                    if asked_for_ticket == "Y":
+                        Order.request_ticket(order_id)
+
+                except OrderError as error:
+                    print(colored_text(f"\n{error}\n", "error"))
+                except Exception as error:
+                    print(colored_text(str(error), "error"))
     
     def trash(self):
-        carts = read_csv("carts.csv")
-        deleted = [cart for cart in carts if cart["card_id"] != self.card_id]
-        write_csv("carts.csv", deleted, ["card_id", "cart"])
+        get_cart_buffer().delete(self.card_id)
         self.cart = []
     
     @classmethod
@@ -189,68 +187,44 @@ class Cart:
                 CART_HELP_TEXT = "\n*** Your Cart ***\n\nThis is your cart. You can update your items quantity with these shortcuts:\n\n  - To ADD an item: Use '-a' or '--add' (Macchiato -a 3)\n  - To DELETE an item: Use '-d' or '--delete' (Americano -d 1)\n  - To pay: Use '-p' or '--pay' (-p)\n"
                 print(colored_text(CART_HELP_TEXT, "gray"))
                 
-                # Build the cart to be displayed
-                cart = []
-                cart_total = 0
-
-                # Calculate unit_price, total, etc.
-                for index, item in enumerate(user_cart):
-                    cart_total += (item["price"] * item["quantity"])
+                cart = cls(user_session["card_id"], user_cart)
 
+                # Build the cart to be displayed
+                rows = []
+                for line in cart.lines.values():
                     obj = {}
-                    obj["item"] = item["coffee"]
-                    obj["unit_price"] = item["price"]
-                    obj["quantity"] = item["quantity"]
-                    obj["total"] = f"{item["price"] * item["quantity"]:.2f}"
-
-                    cart.append(obj)
-
-                    # If we're in the last item, we need to add the row that will display the total (last row of the table)
-                    if index + 1 == len(user_cart):
-                        # To Pay (USD)                  [N]
-                        last_obj = {}
-                        last_obj["item"] = colored_text("To Pay (USD)", "success")
-                        last_obj["unit_price"] = None
-                        last_obj["quantity"] = None
-                        last_obj["total"] = colored_text(f"{cart_total:.2f}", "success")
-
-                        cart.append(last_obj)
+                    obj["item"] = line.coffee
+                    obj["unit_price"] = line.price
+                    obj["quantity"] = line.quantity
+                    obj["total"] = f"{line.cents * line.quantity / 100:.2f}"
+
+                    rows.append(obj)
+
+                # Last row of the table displays the total: To Pay (USD)                  [N]
+                last_obj = {}
+                last_obj["item"] = colored_text("To Pay (USD)", "success")
+                last_obj["unit_price"] = None
+                last_obj["quantity"] = None
+                last_obj["total"] = colored_text(f"{cart.get_total():.2f}", "success")
+                rows.append(last_obj)
                 
-                cart_table = tabulate(title_keys(cart), headers="keys", tablefmt="rounded_grid")
+                cart_table = render_table(rows)
                 print(cart_table)
 
-                cart = cls(user_session["card_id"], user_cart)
                 cart.open()
 
     @classmethod
     def update_user_cart(cls, card_id:str, cart:list) -> None:
-        carts = read_csv("carts.csv")
-        cart_found_index = None
-
-        json_cart = json.dumps(cart)
-        headers = ["card_id", "cart"]
-
-        if len(carts) > 0:
-            for index, obj in enumerate(carts):
-                if obj["card_id"] == card_id:
-                    cart_found_index = index
-
-        if cart_found_index is None:
-            # Cart didn't exist in 'carts.csv' (or 'carts.csv' didn't exist), so we add the cart to the CSV
-            append_csv(file="carts.csv", row={"card_id": card_id, "cart": json_cart}, headers=headers)
-        else:
-            # Cart already existed in 'carts.csv', so we update user cart, and rewrite the entire 'carts.csv'
-            carts[cart_found_index]["cart"] = json_cart
-            write_csv(file="carts.csv", rows=carts, headers=headers)
+        get_cart_buffer().set(card_id, cart)
 
     @classmethod
     def get_user_cart(cls, card_id=None):
-        carts = read_csv(file="carts.csv")
-        user_cart = []
+        # Carts that weren't flushed yet are served from the buffer
+        if (buffered := get_cart_buffer().get(card_id)) is not None:
+            return buffered
 
-        for cart in carts:
-            if cart["card_id"] == card_id:
-                user_cart = json.loads(cart["cart"])
+        if cart := get_storage().find_one("carts", "card_id", card_id):
+            return decode_cart(cart["cart"])
 
-        return user_cart
+        return []
     
\ No newline at end of file
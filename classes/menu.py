@@ -0,0 +1,92 @@
+import os
+from decimal import Decimal
+from utils import read_csv, render_table
+from render_cache import get_render_cache
+
+class Menu:
+    """
+    'menu.csv' loaded once and kept in memory. Items are keyed by their normalized name and prices are already parsed.
+    The file is read again only when it changes on disk (inode, modification time or size).
+    """
+    # Preparation time of the items without one in 'menu.csv'
+    PREP_SECONDS = 120
+
+    def __init__(self, file:str="menu.csv"):
+        self.file = file
+        self._stamp = None
+        self._items = {}
+        self._by_id = {}
+        self._rows = []
+        self._table = None
+
+    @staticmethod
+    def normalize(coffee:str) -> str:
+        """
+        'flat   WHITE' -> 'flat white'
+        """
+        return " ".join(coffee.split()).lower()
+
+    def _refresh(self) -> None:
+        stat = os.stat(self.file)
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if stamp == self._stamp:
+            return
+
+        rows = read_csv(self.file)
+        self._items = {
+            # Items keep their id forever, order lines and carts refer to them by it
+            self.normalize(row["coffee"]): {
+                "id": int(row["id"]),
+                "coffee": row["coffee"],
+                "price": Decimal(row["price"]),
+                # How long the baristas take to prepare one, used to schedule the pickup queue
+                "prep_seconds": int(row.get("prep_seconds") or self.PREP_SECONDS),
+            }
+            for row in rows
+        }
+        self._by_id = {item["id"]: item for item in self._items.values()}
+        # The id and the preparation time are only meant for the app, they're not shown in the menu
+        self._rows = [{key: value for key, value in row.items() if key not in ["id", "prep_seconds"]} for row in rows]
+        # Rendered the first time it's needed
+        self._table = None
+        self._stamp = stamp
+
+    def get(self, coffee:str) -> dict | None:
+        """
+        Returns the menu item ({"id": 3, "coffee": "Latte", "price": Decimal("4.50")}) or None if it's not in the menu
+        """
+        self._refresh()
+        return self._items.get(self.normalize(coffee))
+
+    def by_id(self, id:int) -> dict | None:
+        self._refresh()
+        return self._by_id.get(id)
+
+    def items(self) -> list[dict]:
+        self._refresh()
+        return list(self._items.values())
+
+    def table(self) -> str:
+        """
+        The menu rendered as a table, ready to be printed
+        """
+        self._refresh()
+        if self._table is None:
+            # Rendered by a previous run already, unless 'menu.csv' changed since then
+            cache = get_render_cache()
+            key = f"menu:{os.path.abspath(self.file)}:rounded_grid"
+            stamp = cache.file_stamp(self.file)
+            if (table := cache.get(key, stamp)) is None:
+                table = render_table(self._rows)
+                cache.set(key, table, stamp)
+            self._table = table
+        return self._table
+
+
+_menu = None
+
+def get_menu() -> Menu:
+    global _menu
+    if _menu is None:
+        _menu = Menu()
+    return _menu
@@ -1,23 +1,24 @@
-import re
 import json
-from utils import append_csv, colored_text, read_csv, send_email, play_sound, title_keys
-from tabulate import tabulate
-from operator import itemgetter
+from utils import colored_text, send_email, play_sound, render_table
+from storage import get_storage
+from order_log import get_order_log
+from order_lines import to_rows, get_items
+from order_ids import get_order_ids
 
 class Order:
+    ORDERS_PER_PAGE = 10
     
     @classmethod
     def take(cls):
         # Break circular import
         from .user import User
-        from .cart import Cart
+        from .order_service import OrderService, OrderError
 
         if user_session := User.obtain_session(alert_user=True):
             # print("\n", banner("Order"))
             print(colored_text("\n*** Place Order ***\n\nTips to place your order:\n1. You can add items to your order with this command 'COFFEE [-q \\d]'\n2. To open your cart and modify it, just type '-c|--cart'\n", "gray"))
             
-            menu:list[dict] = read_csv(file="menu.csv")
-            cart = Cart.get_user_cart(card_id=user_session["card_id"])
+            service = OrderService(user_session["card_id"])
             cart_updated:bool = False
 
             # Take user order
@@ -25,34 +26,18 @@ class Order:
                 command = input("Add to Order ('-e' to exit): ").strip()
                 if command in ["-e", "--exit"]: break
 
-                if valid := re.search(r"^([a-zA-Z]+(?: [a-zA-Z]+)?)( -q [1-9]\d*)?$", command):
-                    coffee, quantity = valid.groups()
-
-                    if found := [item for item in menu if item["coffee"] == coffee.title()]:
-                        cart_updated = True
-                        quantity:int = 1 if quantity is None else int(quantity.split(" ")[-1])
-
-                        if already_in_cart := [(index, item) for index, item in enumerate(cart) if item["coffee"] == coffee.title()]:
-                            # If item was already in the cart, update the quantity
-                            index = already_in_cart[0][0]
-                            item = already_in_cart[0][1]
-
-                            cart[index]["quantity"] += quantity
-                            print(colored_text(f"{item['coffee']} added! In order: {cart[index]["quantity"]}", "gray"))
-                        elif not already_in_cart:
-                            # If items was not in the cart already, insert the entire item obj (found[0])
-                            cart.append({"coffee": found[0]["coffee"], "price": float(found[0]["price"]), "quantity": quantity})
-                            print(colored_text(f"{found[0]['coffee']} added! In order: {quantity}", "gray"))
-                    elif not found:
-                        # If coffe not found, i.e: 'Apple Juice -q 3'
-                        print(colored_text("Could not find that Coffee in our menu.", "error"))
-                elif not valid:
-                    # If invalid format, i,e: 'Macchiato -q three'
-                    print(colored_text("Invalid command. Expected format: 'Macchiato [-q \\d]'", "error"))
+                try:
+                    coffee, quantity = service.parse_order(command)
+                    # If item was already in the cart its quantity is updated, if not a new line is added
+                    line = service.add_item(coffee, quantity)
+                    cart_updated = True
+                    print(colored_text(f"{line.coffee} added! In order: {line.quantity}", "gray"))
+                except OrderError as error:
+                    print(colored_text(str(error), "error"))
 
             # Add user cart to 'carts.csv'
             if cart_updated:
-                Cart.update_user_cart(card_id=user_session["card_id"], cart=cart)
+                service.save()
 
     @classmethod
     def request_ticket(cls, order_id:str):
@@ -62,12 +47,12 @@ class Order:
         if user_session := User.obtain_session(alert_user=True):
             confirm = input(colored_text(f"\nRequest ticket for order {order_id}? (Y/N) ", "gray")).strip().upper()
             if confirm == "Y":
-                orders = read_csv("orders.csv")
-                if order_found := [order for order in orders if order["id"] == order_id]:
-                    if ticket_sent := cls.send_ticket(user_session["email"], order_found[0]):
+                # Either the pickup code or the order ID
+                if order_found := get_storage().find_one("orders", "id", get_order_ids().resolve(order_id)):
+                    if ticket_sent := cls.send_ticket(user_session["email"], order_found):
                         # Success
                         print(colored_text("\nDone!", "success"))
-                        print(colored_text("\nYour ticket has been successfully sent to your email!\n", "gray"))
+                        print(colored_text("\nYour ticket is on its way, you'll find it in your email in a moment!\n", "gray"))
                         
                         # Play sound
                         play_sound("sounds/receipt.mp3")
@@ -84,12 +69,18 @@ class Order:
                 "client": client,
                 "date": date,
                 "total": total,
-                "items": items
+                # Items are stored in 'order_lines.csv', the column is only filled in orders placed before it existed
+                "items": ""
             }
-            
-            headers = ["id", "card_id", "client", "date", "total", "items"]
 
-            append_csv("orders.csv", order, headers)
+            # Lines go first, so every order that can be read already has its lines
+            if not get_storage().insert_many("order_lines", to_rows(id, items)):
+                raise Exception()
+            if not get_storage().insert("orders", order):
+                raise Exception()
+
+            # Keep the user's order history log in sync
+            get_order_log().append({**order, "items": items})
         except Exception:
             raise Exception("Internal Error: Could not place your order. Send this error to developer: An error occurred while trying to append order into 'orders.csv' (order/create)")
     
@@ -100,39 +91,54 @@ class Order:
 
         if user_session := User.obtain_session(alert_user=True):
             if orders := cls.get_user_orders(card_id=user_session["card_id"]):
-
-                table = tabulate(title_keys(orders), headers="keys", tablefmt="rounded_grid")
                 print(colored_text("\n*** Order History ***\n\nThis section displays a list of all your past orders, sorted from the latest to the oldest.\nYou can request a printable PDF ticket for any order using its ID and the shortcut '-t' or '--ticket':\n\n- Usecase: '--ticket [ORDER_ID]'\n", "gray"))
-                print(table)
+
+                pages = -(-get_order_log().count(user_session["card_id"]) // cls.ORDERS_PER_PAGE)
+                page = 1
+                while True:
+                    table = render_table(orders)
+                    print(table)
+                    if page == pages:
+                        break
+
+                    # Users with a long history get their orders one page at a time
+                    if input(colored_text(f"Page {page} of {pages}. Show older orders? (Y/N) ", "gray")).strip().upper() != "Y":
+                        break
+                    page += 1
+                    orders = cls.get_user_orders(card_id=user_session["card_id"], page=page)
 
             else:
                 # User doesn't have any orders placed
                 print(colored_text("You don't have any orders yet. To place an order type '-o|--order'!", "gray"))
     
-    @staticmethod
-    def get_user_orders(card_id:str) -> list:
-        orders = read_csv("orders.csv")
+    @classmethod
+    def get_user_orders(cls, card_id:str, page:int=1) -> list:
+        """
+        Returns one page of the user's orders, sorted by date in descending order (latest to oldest)
+        """
+        orders = get_order_log().get(card_id, page=page, per_page=cls.ORDERS_PER_PAGE)
         user_orders = []
 
         for order in orders:
-            if order["card_id"] == card_id:
-                str = "" # Items in str format, i.e: 'Macchiato (2), Americano (3), ...
+            str = "" # Items in str format, i.e: 'Macchiato (2), Americano (3), ...
 
-                for index, item in enumerate(json.loads(order["items"])):
-                    # If is not the first item, add a ", " to the str
-                    separator = "" if index == 0 else ", "
-                    str += f"{separator}{item["coffee"]} ({item["quantity"]})"
+            # Orders logged before order lines existed have their items as JSON
+            items = order["items"] if isinstance(order["items"], list) else json.loads(order["items"] or "[]")
+            for index, item in enumerate(items):
+                # If is not the first item, add a ", " to the str
+                separator = "" if index == 0 else ", "
+                str += f"{separator}{item["coffee"]} ({item["quantity"]})"
 
-                order["items"] = str
-                
-                # Delete 'card_id' since is not needed and is a bit long, affecting the visualization of the orders
-                del order["card_id"]
+            order["items"] = str
+            
+            # Delete 'card_id' since is not needed and is a bit long, affecting the visualization of the orders
+            del order["card_id"]
+            del order["timestamp"]
 
-                # Insert order into 'user_orders'
-                user_orders.append(order)
+            # Insert order into 'user_orders'
+            user_orders.append(order)
 
-        # Return user orders sorted by date, in descending order (latest to oldest)
-        return sorted(user_orders, key=itemgetter("date"), reverse=True)
+        return user_orders
     
     @staticmethod
     def send_ticket(send_to:str, order:dict) -> bool:
@@ -140,7 +146,7 @@ class Order:
         message["Subject"] = f"Your Harvoffe Order Receipt – #{order["id"]}"
         message["To"] = send_to
         
-        body = f"======================================\n           Harvoffe Coffee         \n======================================\nORDER RECEIPT\n\nOrder ID: {order['id']}\nDate: {order['date']}\nCustomer ID: {order['card_id']}\nClient: {order['client']}\n--------------------------------------\nITEMS PURCHASED:\n--------------------------------------\n{"".join(f"{item['coffee']} ({item['quantity']})\n" for item in json.loads(order['items']))}--------------------------------------\nSUBTOTAL: {order['total']}\nTAX: 0\nTOTAL PAID: {order['total']}\n\nThank You for Your Order!\nPickup ID: {order['id']}\n======================================\n"
+        body = f"======================================\n           Harvoffe Coffee         \n======================================\nORDER RECEIPT\n\nOrder ID: {order['id']}\nDate: {order['date']}\nCustomer ID: {order['card_id']}\nClient: {order['client']}\n--------------------------------------\nITEMS PURCHASED:\n--------------------------------------\n{"".join(f"{item['coffee']} ({item['quantity']})\n" for item in get_items(order))}--------------------------------------\nSUBTOTAL: {order['total']}\nTAX: 0\nTOTAL PAID: {order['total']}\n\nThank You for Your Order!\nPickup code: {get_order_ids().code(order['id'])}\n======================================\n"
 
         message["Body"] = body
 
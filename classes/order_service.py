@@ -0,0 +1,154 @@
+import re
+from datetime import datetime
+from metrics import timed
+from order_ids import get_order_ids
+from pickup_queue import get_pickup_queue
+from ledger import get_ledger, cents, LedgerError
+
+class OrderError(Exception):
+    """
+    A command that can't be carried out (unknown coffee, not enough balance, ...). The message is meant for the user.
+    """
+
+
+class OrderService:
+    """
+    Programmatic ordering API for one user: add items, modify the cart and pay, without any prompt.
+    The interactive order and cart views go through it too, so both share the exact same validation.
+    """
+    ORDER_COMMAND = re.compile(r"^([a-zA-Z]+(?: [a-zA-Z]+)?)( -q [1-9]\d*)?$")
+    CART_COMMAND = re.compile(r"^([a-zA-Z]+(?: [a-zA-Z]+)?) (-a|--add|-d|--delete) ([1-9]\d*)$")
+
+    def __init__(self, card_id:str, cart=None):
+        # Break the circular import
+        from .cart import Cart
+        self.card_id = card_id
+        self.cart = cart if cart is not None else Cart(card_id, Cart.get_user_cart(card_id))
+
+    @classmethod
+    def parse_order(cls, command:str) -> tuple[str, int]:
+        """
+        'Macchiato -q 3' -> ('Macchiato', 3)
+        """
+        if not (valid := cls.ORDER_COMMAND.search(command)):
+            # If invalid format, i,e: 'Macchiato -q three'
+            raise OrderError("Invalid command. Expected format: 'Macchiato [-q \\d]'")
+
+        coffee, quantity = valid.groups()
+        return coffee, 1 if quantity is None else int(quantity.split(" ")[-1])
+
+    @classmethod
+    def parse_cart(cls, command:str) -> tuple[str, int, bool]:
+        """
+        'Macchiato -d 2' -> ('Macchiato', 2, False)
+        """
+        if not (matches := cls.CART_COMMAND.search(command)):
+            raise OrderError("Invalid command. Expected format: 'Macchiato (-a|--add|-d|--delete) \\d'")
+
+        return matches.group(1).title(), int(matches.group(3)), matches.group(2) in ["-a", "--add"]
+
+    def add_item(self, coffee:str, quantity:int=1):
+        """
+        Adds a coffee from the menu to the cart. Returns its cart line.
+        """
+        from .menu import get_menu
+
+        if not (found := get_menu().get(coffee)):
+            # If coffe not found, i.e: 'Apple Juice -q 3'
+            raise OrderError("Could not find that Coffee in our menu.")
+
+        return self.cart.add(found["coffee"], float(found["price"]), quantity)
+
+    def modify(self, coffee:str, quantity:int, is_addition:bool):
+        """
+        Adds or deletes units of a coffee already in the cart. Returns its cart line (with quantity 0 if it was deleted).
+        """
+        if (line := self.cart.lines.get(coffee)) is None:
+            # Item is not in the cart
+            raise OrderError(f"Error: Could not find '{coffee}' in your cart!")
+
+        if is_addition:
+            return self.cart.add(coffee, line.price, quantity)
+
+        # Not enough coffees to delete
+        if quantity > line.quantity:
+            plural = "s" if quantity > 1 else ""
+            raise OrderError(f"Could not delete {quantity} {coffee + plural} from your cart, you only have {line.quantity}")
+
+        return self.cart.remove(coffee, quantity)
+
+    def save(self) -> None:
+        """
+        Keeps the cart persistant. It reaches 'carts.csv' on the next flush of the cart buffer.
+        """
+        from cart_buffer import get_cart_buffer
+        get_cart_buffer().set(self.card_id, self.cart.cart)
+
+    @timed("pay")
+    def pay(self, client:str) -> dict:
+        """
+        Pays the cart with the user's balance, places the order and empties the cart. Returns the order.
+        """
+        # Break the circular import
+        from .user import User
+        from .order import Order
+
+        from .menu import get_menu
+
+        total = self.cart.get_total()
+        if not self.cart.lines:
+            raise OrderError("Your cart is empty!")
+        # Order lines refer to menu items, check them before charging anything
+        for coffee in self.cart.lines:
+            if get_menu().get(coffee) is None:
+                raise OrderError(f"'{coffee}' is not in our menu anymore, remove it from your cart ('{coffee} -d N')")
+        if (balance := User.get_balance(self.card_id)) is None:
+            raise OrderError("Your account has no balance, contact the staff")
+        if balance < total:
+            raise OrderError("You don't have enough balance!")
+
+        # Time-ordered ID, unique across terminals, and the short code the customer picks the order up with
+        order_id, pickup = get_order_ids().allocate()
+        # Charge the order to the user's balance in the ledger. Checked again under its lock, another terminal may have paid since
+        try:
+            User.update_balance(self.card_id, total, reference=order_id)
+        except LedgerError as error:
+            raise OrderError(str(error))
+
+        order = {
+            "id": order_id,
+            "card_id": self.card_id,
+            "client": client,
+            "date": datetime.now().strftime("%b %d, %Y %H:%M:%S"),
+            "total": total,
+            "items": self.cart.cart,
+        }
+        # Create order using 'Order' class. If it can't be saved, the charge is refunded: nothing was bought
+        try:
+            Order.create(**order)
+        except Exception:
+            get_ledger().credit(self.card_id, cents(total), reference=order_id, kind="refund")
+            raise
+        # The baristas can start preparing it
+        get_pickup_queue().add(order_id, pickup, client, order["items"])
+
+        self.cart.trash()
+        return {**order, "pickup": pickup}
+
+    def execute(self, command:str, client:str) -> dict | None:
+        """
+        Runs one command, as it would be typed in the order or cart views: 'Macchiato -q 3', 'Macchiato -d 1', '-p'...
+        Returns the order when the command was a payment.
+        """
+        command = command.strip()
+        if command in ["-p", "--pay"]:
+            return self.pay(client)
+
+        if self.CART_COMMAND.search(command):
+            coffee, quantity, is_addition = self.parse_cart(command)
+            self.modify(coffee, quantity, is_addition)
+        else:
+            coffee, quantity = self.parse_order(command)
+            self.add_item(coffee, quantity)
+        self.save()
+        return None
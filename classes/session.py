@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import secrets
+from utils import file_lock
+from storage import get_storage
+
+class SessionManager:
+    """
+    Keeps the active sessions in memory. Sessions are identified by a random token that expires after 'ttl' seconds.
+
+    Only '{terminal: {token, card_id, expires_at}}' is saved in 'session.json' (never the password hash or the balance),
+    so every terminal sharing the directory keeps its own session. The user data handed out is taken from the store,
+    and checked against it again at most every 'revalidate_after' seconds.
+    """
+    USER_FIELDS = ["first", "last", "email", "card_id"]
+
+    def __init__(self, file:str="session.json", terminal:str="default", ttl:int=8 * 3600, revalidate_after:int=30):
+        self.file = file
+        self.terminal = terminal
+        self.ttl = ttl
+        self.revalidate_after = revalidate_after
+        self.sessions:dict[str, dict] = {}
+        self._terminal_token = None
+        self._loaded = False
+
+    def _read_file(self) -> dict:
+        try:
+            with open(self.file, "r") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+        if "card_id" in data:
+            # Old 'session.json', which held the whole user. Keep the user logged in, but drop what we don't want on disk
+            data = {self.terminal: {"token": secrets.token_hex(16), "card_id": data["card_id"], "expires_at": time.time() + self.ttl}}
+            with file_lock(self.file):
+                self._write_file(data)
+        return data
+
+    def _write_file(self, data:dict) -> None:
+        with open(self.file + ".tmp", "w") as file:
+            json.dump(data, file)
+        os.replace(self.file + ".tmp", self.file)
+
+    def _save_terminal(self, entry:dict | None) -> None:
+        """
+        Saves (or removes, if 'entry' is None) this terminal's session, leaving other terminals' sessions untouched
+        """
+        try:
+            with file_lock(self.file):
+                data = self._read_file()
+                if entry is None:
+                    data.pop(self.terminal, None)
+                else:
+                    data[self.terminal] = entry
+                self._write_file(data)
+        except OSError as error:
+            print(f"Internal Error: Couldn't save user session in '{self.file}' file.\nSend this error to the developer: {error}")
+
+    def create(self, user:dict) -> str:
+        """
+        Opens a new session for the user and returns its token
+        """
+        token = secrets.token_hex(16)
+        self.sessions[token] = {
+            "card_id": user["card_id"],
+            "expires_at": time.time() + self.ttl,
+            "user": {field: user[field] for field in self.USER_FIELDS},
+            "validated_at": time.monotonic(),
+        }
+        return token
+
+    def get(self, token:str) -> dict | None:
+        """
+        Returns the user of the session, or None if the session doesn't exist, expired, or its user doesn't exist anymore
+        """
+        if (session := self.sessions.get(token)) is None:
+            return None
+
+        if time.time() >= session["expires_at"]:
+            self.close(token)
+            return None
+
+        if session["user"] is None or time.monotonic() - session["validated_at"] >= self.revalidate_after:
+            if (user := get_storage().find_one("users", "card_id", session["card_id"])) is None:
+                self.close(token)
+                return None
+            session["user"] = {field: user[field] for field in self.USER_FIELDS}
+            session["validated_at"] = time.monotonic()
+
+        return dict(session["user"])
+
+    def close(self, token:str) -> None:
+        self.sessions.pop(token, None)
+        if token == self._terminal_token:
+            self._terminal_token = None
+            self._save_terminal(None)
+
+    def start(self, user:dict) -> str:
+        """
+        Opens a session for the user on this terminal, and saves it so it survives a restart
+        """
+        # A new login replaces whatever session this terminal had
+        self.sessions.pop(self._terminal_token, None)
+        token = self.create(user)
+        self._terminal_token = token
+        self._loaded = True
+        self._save_terminal({"token": token, "card_id": user["card_id"], "expires_at": self.sessions[token]["expires_at"]})
+        return token
+
+    def current(self) -> dict | None:
+        """
+        User of this terminal's session, if there's one
+        """
+        if not self._loaded:
+            # Only read 'session.json' once, afterwards the session lives in memory
+            self._loaded = True
+            if entry := self._read_file().get(self.terminal):
+                self._terminal_token = entry["token"]
+                # The user is loaded from the store the first time it's needed
+                self.sessions[entry["token"]] = {"card_id": entry["card_id"], "expires_at": entry["expires_at"], "user": None, "validated_at": 0}
+
+        if self._terminal_token is None:
+            return None
+        return self.get(self._terminal_token)
+
+    def close_current(self) -> None:
+        if self._terminal_token is not None:
+            self.close(self._terminal_token)
+
+
+_session_manager = None
+
+def get_session_manager() -> SessionManager:
+    global _session_manager
+    if _session_manager is None:
+        _session_manager = SessionManager(
+            terminal=os.environ.get("HARVOFFE_TERMINAL", "default"),
+            ttl=int(os.environ.get("HARVOFFE_SESSION_TTL", 8 * 3600)),
+        )
+    return _session_manager
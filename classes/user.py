@@ -1,15 +1,19 @@
-import os
-import json
 import uuid
 import re
-from utils import colored_text, read_csv, write_csv, append_csv
+from utils import colored_text
+from storage import get_storage
 from .auth import Auth
+from .session import get_session_manager
+from email_index import get_email_index
+from ledger import get_ledger, cents, LedgerError
 
 
 class Person():
     """
     Person class, in case we'd like to add teachers to the application
     """
+    NAME_PATTERN = re.compile(r"^[A-Z]+(?: [A-Z]+)*$", re.IGNORECASE)
+
     def __init__(self, first, last):
         self.first = first
         self.last = last
@@ -20,7 +24,7 @@ class Person():
     
     @first.setter
     def first(self, first):
-        if not re.search(r"^[A-Z]+(?: [A-Z]+)*$", first, re.IGNORECASE):
+        if not self.NAME_PATTERN.search(first):
             raise ValueError("Please provide a valid first, i.e: 'David'")
        
         self._first = first
@@ -31,13 +35,16 @@ class Person():
     
     @last.setter
     def last(self, last):
-        if not re.search(r"^[A-Z]+(?: [A-Z]+)*$", last, re.IGNORECASE):
+        if not self.NAME_PATTERN.search(last):
             raise ValueError("Please provide a valid last, i.e: 'Malan'")
 
         self._last = last
 
 
 class User(Person):
+    EMAIL_PATTERN = re.compile(r"^[a-zA-Z0-9.!#$%&'*+\/=?^_`{|}~-]+@[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?(?:\.[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?)*$", re.IGNORECASE)
+    PASSWORD_PATTERN = re.compile(r"(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[@$!%*?&])[A-Za-z\d@$!%*?&]{8,}")
+
     def __init__(self, first, last, email, password):
         super().__init__(first, last)
         self.email = email
@@ -47,22 +54,25 @@ class User(Person):
         return "Hello " + self.first
     
     # This should use an append_csv from utils
-    def create(self) -> None:
+    def create(self, announce:bool=True) -> dict | None:
         card = self.create_card()
-        headers = [
-            "first", "last", "email", "password", "card_id", "balance"
-        ]
         user = {
             "first": self.first,
             "last": self.last,
             "email": self.email,
             "password": self.password,
             "card_id": card["id"],
+            # Opening balance, the current one is kept in the ledger
             "balance": card["balance"]
         }
         
-        if success := append_csv("users.csv", user, headers):
-            print(colored_text("\nYour user has been successfully created!\n", "success"))
+        if success := get_storage().insert("users", user):
+            # Keep the email index in sync, so the email can't be used again
+            get_email_index().add(self.email)
+            get_ledger().open_account(str(card["id"]), cents(card["balance"]))
+            if announce:
+                print(colored_text("\nYour user has been successfully created!\n", "success"))
+            return user
     
     @classmethod
     def init_creation_process(cls):
@@ -98,26 +108,21 @@ class User(Person):
 
     @classmethod
     def get_balance(cls, card_id):
-        users = read_csv("users.csv")
-        user_balance = None
-        for user in users:
-            if user["card_id"] == card_id:
-                user_balance = user["balance"]
+        # Served from the ledger's in-memory view, 'users.csv' only has the opening balance. None if there's no such user
+        balance = get_ledger().balance(str(card_id))
         
-        return float(user_balance)
+        return None if balance is None else balance / 100
 
     @classmethod
-    def update_balance(cls, card_id, paid):
+    def update_balance(cls, card_id, paid, reference=""):
+        """
+        Charges 'paid' to the user. Raises 'LedgerError' if the balance isn't enough (i.e: another terminal paid first)
+        """
         try:
-            users = read_csv("users.csv")
-            for user in users:
-                if user["card_id"] == card_id:
-                    user["balance"] = float(user["balance"]) - paid
-
-            headers = [
-                "first", "last", "email", "password", "card_id", "balance"
-            ]
-            write_csv('users.csv', users, headers)
+            # A single append to the ledger, checked and charged under its lock so terminals paying at the same time can't overdraw
+            get_ledger().debit(str(card_id), cents(paid), reference)
+        except LedgerError:
+            raise
         except Exception as error:
             print(error)
             raise Exception("Internal Error: Could not place your order. Send this error to developer: An error occurred while trying to update user's balance (user/update_balance)")
@@ -130,7 +135,7 @@ class User(Person):
             if email in ["-e", "--exit"]: break
 
             # Validate email format
-            if valid := re.search(r"^[a-zA-Z0-9.!#$%&'*+\/=?^_`{|}~-]+@[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?(?:\.[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?)*$", email, re.IGNORECASE):
+            if valid := cls.EMAIL_PATTERN.search(email):
                 # Validate if email is not already in use
                 if not_used := Auth.check_if_email_is_in_use(email):
                     # Send code and return the code sent
@@ -165,7 +170,7 @@ class User(Person):
             password = input("Password ('-e' to exit): ").strip()
             if password in ["-e", "--exit"]: break
             
-            if valid := re.search(r"(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[@$!%*?&])[A-Za-z\d@$!%*?&]{8,}", password):
+            if valid := cls.PASSWORD_PATTERN.search(password):
                 return Auth.hash_password(password)
             else:
                 # Print error and guide
@@ -182,7 +187,7 @@ class User(Person):
             if not name:
                 print(colored_text("Name cannot be empty.", "error"))
                 continue
-            elif not re.search(r"^[A-Z]+(?: [A-Z]+)*$", name, re.IGNORECASE):
+            elif not cls.NAME_PATTERN.search(name):
                 print(colored_text("Invalid name. Please use letters only.", "error"))
                 continue
             else:
@@ -190,7 +195,6 @@ class User(Person):
 
     @classmethod
     def create_session(cls):
-        users:list[dict] = read_csv("users.csv")
         user_found = None
 
         # Prompt for email:
@@ -198,9 +202,8 @@ class User(Person):
             email = input("Email ('-e' to exit): ").strip()
             if email in ["-e", "--exit"]: return False
 
-            found = [user for user in users if user["email"] == email]
-            if found != []:
-                user_found = found[0]
+            if found := get_storage().find_one("users", "email", email):
+                user_found = found
                 break
             else:
                 print(colored_text("Could not find any user associated to your email", "error"))
@@ -212,13 +215,13 @@ class User(Person):
             if password in ["-e", "--exit"]: return False
 
             if valid_password := Auth.check_password(password, user_found["password"]):            
+                # Hashes made with an older cost factor are upgraded in the background
+                if Auth.needs_rehash(user_found["password"]):
+                    Auth.rehash_in_background(user_found["card_id"], password)
+
                 # Create user session
-                try:
-                    with open("session.json", "w") as file:
-                        json.dump({**user_found}, file)
-                    break
-                except Exception as error:
-                    print(f"Internal Error: Couldn't create user session in 'session.json' file.\nSend this error to the developer: {error}")
+                get_session_manager().start(user_found)
+                break
             else:
                 print(colored_text("Invalid password.", "error"))
                 continue
@@ -230,18 +233,19 @@ class User(Person):
 
     @staticmethod
     def close_session():
-        if os.path.exists("session.json"):
+        if get_session_manager().current():
             confirm = input("Close your current session? (y/n)").strip().upper()
             if confirm == "Y":
-                    os.remove("session.json")
+                    get_session_manager().close_current()
                     print(colored_text("\nSession closed!\n", "success"))
 
     @staticmethod
     def obtain_session(alert_user=False):
-        if os.path.exists("session.json"):
-            with open("session.json", "r") as file:
-                session_data = json.load(file)
-                return session_data
+        """
+        Returns the user of this terminal's session ('first', 'last', 'email' and 'card_id'), or None if nobody is authenticated
+        """
+        if session_data := get_session_manager().current():
+            return session_data
         else:
             if alert_user:
                 print(colored_text("Please authenticate (-auth) in order to continue.", "alert"))
@@ -0,0 +1,201 @@
+import os
+import sys
+import json
+import array
+import shutil
+import calendar
+import functools
+from datetime import datetime, timedelta
+from order_lines import stream_orders
+
+# Every column of the compacted orders: one value per order line, saved as a little-endian binary file
+COLUMNS = {
+    "order": ("i", "<i4"),  # Position of the order id in 'order_ids.txt'
+    "card": ("i", "<i4"),  # Position of the card id in 'card_ids.txt'
+    "timestamp": ("q", "<i8"),  # Seconds since 1970-01-01, in the shop's wall clock (the date as it's written in the order)
+    "coffee": ("H", "<u2"),  # Position of the coffee in 'meta.json'
+    "price": ("i", "<i4"),  # Unit price in cents
+    "quantity": ("i", "<i4"),
+}
+CHUNK = 65536
+
+@functools.lru_cache(maxsize=4096)
+def _day_seconds(day:str) -> int:
+    return calendar.timegm(datetime.strptime(day, "%b %d, %Y").timetuple())
+
+def to_seconds(date:str) -> int:
+    """
+    'Nov 03, 2025 19:28:01' -> 1762198081. Only the day goes through 'strptime' (cached), the time is added by hand
+    """
+    seconds = _day_seconds(date[:12])
+    if len(date) > 12:
+        hours, minutes, secs = date[13:].split(":")
+        seconds += int(hours) * 3600 + int(minutes) * 60 + int(secs)
+    return seconds
+
+def compact(directory:str="order_columns") -> int:
+    """
+    Converts every order into columns, one row per order line, so analytics never parse the 'items' JSON again.
+    Runs offline (i.e: every night), the new columns replace the old ones only once they're complete. Returns the number of lines.
+    """
+    temp_directory = directory + ".tmp"
+    shutil.rmtree(temp_directory, ignore_errors=True)
+    os.makedirs(temp_directory)
+
+    codes = {"order": {}, "card": {}, "coffee": {}}
+    buffers = {name: array.array(typecode) for name, (typecode, _) in COLUMNS.items()}
+    files = {name: open(os.path.join(temp_directory, f"{name}.bin"), "wb") for name in COLUMNS}
+    lines = 0
+
+    def flush() -> None:
+        for name, buffer in buffers.items():
+            if sys.byteorder == "big":
+                buffer.byteswap()
+            buffer.tofile(files[name])
+            del buffer[:]
+
+    try:
+        for row in stream_orders():
+            try:
+                timestamp = to_seconds(row["date"])
+            except (KeyError, TypeError, ValueError):
+                # Broken rows are left out, like the reports do
+                continue
+            if (items := row["items"]) is None:
+                continue
+
+            order = codes["order"].setdefault(row["id"], len(codes["order"]))
+            card = codes["card"].setdefault(row["card_id"], len(codes["card"]))
+            for item in items:
+                buffers["order"].append(order)
+                buffers["card"].append(card)
+                buffers["timestamp"].append(timestamp)
+                buffers["coffee"].append(codes["coffee"].setdefault(item["coffee"], len(codes["coffee"])))
+                buffers["price"].append(round(float(item["price"]) * 100))
+                buffers["quantity"].append(int(item["quantity"]))
+                lines += 1
+
+            if len(buffers["order"]) >= CHUNK:
+                flush()
+        flush()
+    finally:
+        for file in files.values():
+            file.close()
+
+    for name in ["order", "card"]:
+        with open(os.path.join(temp_directory, f"{name}_ids.txt"), "w") as file:
+            file.writelines(f"{value}\n" for value in codes[name])
+    with open(os.path.join(temp_directory, "meta.json"), "w") as file:
+        json.dump({"lines": lines, "columns": {name: dtype for name, (_, dtype) in COLUMNS.items()}, "coffees": list(codes["coffee"])}, file)
+
+    # Swap the directories, readers see either the old columns or the new ones
+    old_directory = directory + ".old"
+    shutil.rmtree(old_directory, ignore_errors=True)
+    if os.path.exists(directory):
+        os.replace(directory, old_directory)
+    os.replace(temp_directory, directory)
+    shutil.rmtree(old_directory, ignore_errors=True)
+    return lines
+
+
+class OrderColumns:
+    """
+    Vectorized analytics over the compacted orders (see 'compact'). Columns are memory-mapped, and every aggregation
+    is a handful of NumPy operations over them instead of a loop over the orders.
+    """
+    def __init__(self, directory:str="order_columns"):
+        try:
+            # NumPy is only needed here, the rest of the app runs without it
+            import numpy
+        except ImportError:
+            raise RuntimeError("The columnar analytics need NumPy ('pip install numpy')")
+        self.np = numpy
+        self.directory = directory
+
+        with open(os.path.join(directory, "meta.json"), "r") as file:
+            meta = json.load(file)
+        self.lines = meta["lines"]
+        self.coffees = meta["coffees"]
+        self.columns = {}
+        for name, dtype in meta["columns"].items():
+            path = os.path.join(directory, f"{name}.bin")
+            # An empty file can't be memory-mapped
+            self.columns[name] = numpy.memmap(path, dtype=dtype, mode="r") if self.lines else numpy.zeros(0, dtype=dtype)
+
+    @functools.cached_property
+    def card_ids(self) -> list[str]:
+        # Only read when a report needs the actual ids
+        with open(os.path.join(self.directory, "card_ids.txt"), "r") as file:
+            return file.read().splitlines()
+
+    def window(self, since:str | None=None, until:str | None=None):
+        """
+        Lines placed between 'since' and 'until' (both 'YYYY-MM-DD', included), as a boolean mask
+        """
+        timestamp = self.columns["timestamp"]
+        mask = self.np.ones(len(timestamp), dtype=bool)
+        if since:
+            mask &= timestamp >= calendar.timegm(datetime.strptime(since, "%Y-%m-%d").timetuple())
+        if until:
+            mask &= timestamp < calendar.timegm(datetime.strptime(until, "%Y-%m-%d").timetuple()) + 86400
+        return mask
+
+    def revenue_per_coffee(self, mask) -> list[dict]:
+        np = self.np
+        coffee = self.columns["coffee"][mask]
+        quantity = self.columns["quantity"][mask].astype(np.int64)
+        revenue = quantity * self.columns["price"][mask]
+
+        quantities = np.bincount(coffee, weights=quantity, minlength=len(self.coffees))
+        revenues = np.bincount(coffee, weights=revenue, minlength=len(self.coffees))
+        order = np.argsort(-revenues, kind="stable")
+        return [
+            {"coffee": self.coffees[code], "quantity": int(quantities[code]), "revenue": f"{revenues[code] / 100:.2f}"}
+            for code in order if quantities[code]
+        ]
+
+    def revenue_per_day(self, mask) -> list[dict]:
+        np = self.np
+        days = self.columns["timestamp"][mask] // 86400
+        revenue = self.columns["quantity"][mask].astype(np.int64) * self.columns["price"][mask]
+
+        unique_days, day_of_line = np.unique(days, return_inverse=True)
+        revenues = np.bincount(day_of_line, weights=revenue, minlength=len(unique_days))
+        # Lines of the same order share its day, so each order is counted on the day of its first line
+        _, first_lines = np.unique(self.columns["order"][mask], return_index=True)
+        orders = np.bincount(day_of_line[first_lines], minlength=len(unique_days))
+
+        return [
+            {"day": (datetime(1970, 1, 1) + timedelta(days=int(day))).date().isoformat(), "orders": int(orders[i]), "revenue": f"{revenues[i] / 100:.2f}"}
+            for i, day in enumerate(unique_days)
+        ]
+
+    def top_customers(self, mask, top:int=10) -> list[dict]:
+        np = self.np
+        card = self.columns["card"][mask]
+        revenue = self.columns["quantity"][mask].astype(np.int64) * self.columns["price"][mask]
+
+        revenues = np.bincount(card, weights=revenue)
+        # Only the 'top' largest are sorted
+        best = np.argpartition(-revenues, min(top, len(revenues)) - 1)[:top] if len(revenues) else []
+        best = sorted(best, key=lambda code: -revenues[code])
+        return [{"card_id": self.card_ids[code], "revenue": f"{revenues[code] / 100:.2f}"} for code in best if revenues[code]]
+
+    def reports(self, since:str | None=None, until:str | None=None, top:int=10) -> dict[str, list[dict]]:
+        mask = self.window(since, until)
+        return {
+            "revenue_per_day": self.revenue_per_day(mask),
+            "revenue_per_coffee": self.revenue_per_coffee(mask),
+            "top_customers": self.top_customers(mask, top),
+        }
+
+
+if __name__ == "__main__":
+    # Usage: python columnar.py compact [DIRECTORY]  -> Compacts the orders into columns
+    #        python columnar.py report [SINCE] [UNTIL] -> Revenue per day and coffee, top customers (dates as YYYY-MM-DD)
+    if sys.argv[1:2] == ["compact"]:
+        print(f"{compact(*sys.argv[2:3])} order lines compacted")
+    elif sys.argv[1:2] == ["report"]:
+        print(json.dumps(OrderColumns().reports(*sys.argv[2:4]), indent=2))
+    else:
+        print("Usage: python columnar.py compact [DIRECTORY] | python columnar.py report [SINCE] [UNTIL]")
@@ -0,0 +1,89 @@
+import os
+import re
+from utils import read_csv, render_table
+from render_cache import get_render_cache
+
+class Command:
+    """
+    One row of 'shortcuts.csv', plus the function the prompt runs for it
+    """
+    __slots__ = ("name", "shortcut", "action", "usecase", "view", "handler", "argument")
+
+    def __init__(self, name:str, shortcut:str, action:str, usecase:str, view:str):
+        self.name = name
+        self.shortcut = shortcut
+        self.action = action
+        self.usecase = usecase
+        # Where the command can be typed: 'prompt', or inside the 'order', 'cart' or 'barista' views
+        self.view = view
+        self.handler = None
+        # Compiled pattern of the argument, for commands that take one (i.e: '-t ABC123')
+        self.argument = None
+
+
+class CommandRegistry:
+    """
+    Every prompt command, built once from 'shortcuts.csv'. Both the command and its shortcut ('--menu' and '-m') point
+    to the same handler, so dispatching an input is a single dict lookup.
+
+    'shortcuts.csv' is the only list of commands: registering a handler for a command that isn't in it raises,
+    'check' raises if a prompt command in it has no handler, and the shortcuts table is rendered from the registry.
+    """
+    def __init__(self, file:str="shortcuts.csv"):
+        self.file = file
+        self.commands:dict[str, Command] = {}
+        for row in read_csv(file):
+            self.commands[row["command"]] = Command(row["command"], row["shortcut"], row["action"], row["usecase"], row["view"])
+        # '--menu' -> Command and '-m' -> Command
+        self.aliases:dict[str, Command] = {}
+
+    def register(self, name:str, handler, argument:str | None=None) -> None:
+        """
+        Runs 'handler' when the command (or its shortcut) is typed in the prompt. If 'argument' is given, the command
+        must be followed by a space and an argument matching it, which is passed to the handler.
+        """
+        if (command := self.commands.get(name)) is None:
+            raise ValueError(f"'{name}' is not in '{self.file}', add it there first")
+        command.handler = handler
+        command.argument = re.compile(argument) if argument is not None else None
+        self.aliases[command.name] = self.aliases[command.shortcut] = command
+
+    def check(self) -> None:
+        """
+        Every prompt command listed in 'shortcuts.csv' must have a handler
+        """
+        if missing := [command.name for command in self.commands.values() if command.view == "prompt" and command.handler is None]:
+            raise ValueError(f"No handler for {', '.join(missing)} (listed in '{self.file}')")
+
+    def dispatch(self, text:str) -> bool:
+        """
+        Runs the command typed. Returns False if it isn't a prompt command (or its argument isn't valid).
+        """
+        name, _, argument = text.partition(" ")
+        if (command := self.aliases.get(name)) is None:
+            return False
+
+        if command.argument is None:
+            if argument:
+                return False
+            command.handler()
+        else:
+            if not command.argument.fullmatch(argument):
+                return False
+            command.handler(argument)
+        return True
+
+    def table(self) -> str:
+        """
+        Every command of 'shortcuts.csv' rendered as a table, rendered again only when the file changes
+        """
+        cache = get_render_cache()
+        key = f"commands:{os.path.abspath(self.file)}:rounded_grid"
+        stamp = cache.file_stamp(self.file)
+        if (table := cache.get(key, stamp)) is None:
+            table = render_table([
+                {"command": command.name, "shortcut": command.shortcut, "action": command.action, "usecase": command.usecase}
+                for command in self.commands.values()
+            ])
+            cache.set(key, table, stamp)
+        return table
@@ -0,0 +1,36 @@
+import os
+import shutil
+import pytest
+import storage
+import ledger
+import order_ids
+import order_log
+import cart_buffer
+import email_index
+import pickup_queue
+from classes import menu, session
+
+CARD_ID = "597af187-12ee-4279-81b7-e83397dbab20"
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """
+    An empty shop in a temporary directory, with one user (and the menu). Every store and index is created again
+    for it, and 'monkeypatch' puts the previous ones back after the test, even if it fails.
+    """
+    with open(tmp_path / "users.csv", "w") as file:
+        file.write("first,last,email,password,card_id,balance\n")
+        file.write(f"Nacho,Feijoo,ignacio.cs50p@gmail.com,hash,{CARD_ID},1000\n")
+    shutil.copy(os.path.join(os.path.dirname(__file__), "menu.csv"), tmp_path)
+    monkeypatch.chdir(tmp_path)
+
+    monkeypatch.setattr(storage, "_storage", storage.CSVStorage())
+    for module, name in [
+        (ledger, "_ledger"), (order_ids, "_order_ids"), (order_log, "_order_log"), (cart_buffer, "_cart_buffer"),
+        (email_index, "_email_index"), (pickup_queue, "_pickup_queue"), (menu, "_menu"), (session, "_session_manager"),
+    ]:
+        monkeypatch.setattr(module, name, None)
+    # Every terminal of the test runs as the same one, with no audio
+    monkeypatch.setenv("HARVOFFE_TERMINAL", "test")
+    monkeypatch.setenv("HARVOFFE_AUDIO", "off")
+    yield tmp_path
@@ -0,0 +1,84 @@
+import os
+import csv
+import mmap
+
+class CSVIndex:
+    """
+    Byte offset of every row of a CSV file, grouped by the value of some of its columns, so a point lookup seeks
+    straight to its rows instead of parsing the file again. Only offsets are kept in memory, never the rows.
+
+    Built with a single pass over the memory-mapped file. Rows appended since (by any terminal) are indexed on the
+    next lookup, the whole file is indexed again only if it was replaced (i.e: rewritten) or shrunk.
+    """
+    def __init__(self, file:str, columns:list[str]):
+        self.file = file
+        self.columns = columns
+        self._reset(None)
+
+    def _reset(self, inode) -> None:
+        self.headers:list[str] | None = None
+        self.offsets:dict[str, dict[str, list[int]]] = {column: {} for column in self.columns}
+        self._inode = inode
+        self._end = 0  # Offset right after the last row indexed
+
+    def _records(self, map:mmap.mmap, start:int):
+        """
+        Yields (offset, fields) of every record from 'start'. A row another terminal is still appending
+        (no line break yet) is left for the next time.
+        """
+        map.seek(start)
+
+        def lines():
+            while (line := map.readline()).endswith(b"\n"):
+                yield line.decode("utf-8")
+
+        offset = start
+        # 'csv.reader' only pulls the lines of the record it's parsing, so the map is always at the start of the next one
+        for fields in csv.reader(lines()):
+            if fields:
+                yield offset, fields
+            offset = map.tell()
+
+    def _refresh(self, file, map:mmap.mmap | None) -> None:
+        stat = os.fstat(file.fileno())
+        if stat.st_ino != self._inode or stat.st_size < self._end:
+            self._reset(stat.st_ino)
+        if map is None or stat.st_size == self._end:
+            return
+
+        records = self._records(map, self._end)
+        if self.headers is None:
+            if (header := next(records, None)) is None:
+                return
+            self.headers = header[1]
+            self._end = map.tell()
+
+        positions = [(self.offsets[column], self.headers.index(column)) for column in self.columns]
+        for offset, fields in records:
+            for offsets, position in positions:
+                offsets.setdefault(fields[position] if position < len(fields) else "", []).append(offset)
+            self._end = map.tell()
+
+    def find(self, column:str, value:str) -> list[dict]:
+        """
+        Rows where 'column' == 'value', read straight from their offsets
+        """
+        try:
+            file = open(self.file, "rb")
+        except FileNotFoundError:
+            self._reset(None)
+            return []
+
+        with file:
+            # An empty file can't be memory-mapped
+            map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(file.fileno()).st_size else None
+            try:
+                self._refresh(file, map)
+                rows = []
+                for offset in self.offsets[column].get(value, []):
+                    _, fields = next(self._records(map, offset))
+                    rows.append(dict(zip(self.headers, fields)))
+                return rows
+            finally:
+                if map is not None:
+                    map.close()
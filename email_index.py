@@ -0,0 +1,156 @@
+import os
+import math
+import mmap
+import struct
+import hashlib
+from utils import file_lock
+
+def normalize(email:str) -> str:
+    """
+    ' David@Harvard.EDU ' -> 'david@harvard.edu'. Two emails that only differ in case are the same account
+    """
+    return email.strip().lower()
+
+
+class BloomFilter:
+    """
+    Fixed-size set of bits saved in a file and memory-mapped, so it's ready right after a restart without reading anything.
+    'in' may answer True for an email that was never added (about 'error_rate' of the time), but never False for one that was.
+
+    File layout: 'HBF1', number of bits, number of hashes, number of items added, then the bits.
+    """
+    HEADER = struct.Struct("<4sQIQ")
+
+    def __init__(self, path:str, capacity:int=1_000_000, error_rate:float=0.001):
+        self.path = path
+        if not os.path.exists(path):
+            bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+            hashes = max(1, round(bits / capacity * math.log(2)))
+            with open(path + ".tmp", "wb") as file:
+                file.write(self.HEADER.pack(b"HBF1", bits, hashes, 0))
+                file.truncate(self.HEADER.size + -(-bits // 8))
+            os.replace(path + ".tmp", path)
+
+        self.file = open(path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        magic, self.bits, self.hashes, self.count = self.HEADER.unpack_from(self.map)
+        if magic != b"HBF1":
+            raise ValueError(f"'{path}' is not a bloom filter")
+
+    def _positions(self, item:str):
+        # Double hashing: 'hashes' positions out of a single 128 bits digest
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.bits for i in range(self.hashes))
+
+    def add(self, item:str) -> None:
+        """
+        Callers serialize adds (see 'EmailIndex.add'), the file is shared with every other terminal
+        """
+        for position in self._positions(item):
+            self.map[self.HEADER.size + position // 8] |= 1 << (position % 8)
+        # Other terminals may have added items since we opened the file
+        self.count = self.HEADER.unpack_from(self.map)[3] + 1
+        self.HEADER.pack_into(self.map, 0, b"HBF1", self.bits, self.hashes, self.count)
+
+    def __contains__(self, item:str) -> bool:
+        return all(self.map[self.HEADER.size + position // 8] & (1 << (position % 8)) for position in self._positions(item))
+
+    def close(self) -> None:
+        self.map.close()
+        self.file.close()
+
+
+class EmailIndex:
+    """
+    Set of every normalized email in use, so checking if an email is taken never reads 'users.csv'.
+
+    The index is an append-only file with one email per line ('emails.index'), kept in sync by 'User.create'.
+    It's loaded once and then only the lines added since (by any terminal) are read. With a bloom filter, most emails
+    that aren't taken (i.e: almost every registration) are answered without loading the index at all.
+    """
+    def __init__(self, path:str="emails.index", bloom:BloomFilter | None=None):
+        self.path = path
+        self.bloom = bloom
+        self._emails = None
+        self._offset = 0
+
+        if bloom is not None and bloom.count == 0 and os.path.exists(path):
+            # New bloom filter for an index that already exists, fill it once
+            with file_lock(path):
+                for email in self._load():
+                    bloom.add(email)
+
+    def _load(self) -> set:
+        if not os.path.exists(self.path):
+            # First run, build the index from the users we already have
+            self.rebuild()
+
+        if self._emails is None:
+            self._emails = set()
+        with open(self.path, "r") as file:
+            file.seek(self._offset)
+            while (line := file.readline()).endswith("\n"):
+                self._emails.add(line[:-1])
+                self._offset = file.tell()
+        return self._emails
+
+    def contains(self, email:str) -> bool:
+        email = normalize(email)
+        if self.bloom is not None and os.path.exists(self.path) and email not in self.bloom:
+            # Definitely not in use
+            return False
+        return email in self._load()
+
+    def add(self, email:str) -> None:
+        email = normalize(email)
+        # Other terminals may be registering users too
+        with file_lock(self.path):
+            self._load()
+            with open(self.path, "a") as file:
+                file.write(email + "\n")
+            self._emails.add(email)
+            if self.bloom is not None:
+                self.bloom.add(email)
+
+    def rebuild(self) -> None:
+        """
+        (Re)creates the index (and the bloom filter's bits) from every user in the store
+        """
+        # Imported here, the store is only read to build the index
+        from storage import get_storage
+
+        with file_lock(self.path):
+            emails = {normalize(user["email"]) for user in get_storage().stream("users")}
+            with open(self.path + ".tmp", "w") as file:
+                file.writelines(f"{email}\n" for email in emails)
+            os.replace(self.path + ".tmp", self.path)
+
+            if self.bloom is not None:
+                for email in emails:
+                    self.bloom.add(email)
+
+        self._emails = None
+        self._offset = 0
+
+
+_email_index = None
+
+def get_email_index() -> EmailIndex:
+    """
+    Returns the email index. Set 'HARVOFFE_EMAIL_BLOOM' to the expected number of users (i.e: 5000000) to back it
+    with a bloom filter ('emails.bloom'), for user bases too large to load the index on every start.
+    """
+    global _email_index
+    if _email_index is None:
+        bloom = None
+        if capacity := os.environ.get("HARVOFFE_EMAIL_BLOOM"):
+            bloom = BloomFilter("emails.bloom", capacity=int(capacity))
+        _email_index = EmailIndex("emails.index", bloom)
+    return _email_index
+
+
+if __name__ == "__main__":
+    # Usage: python email_index.py -> Rebuilds the index from the store (i.e: after editing 'users.csv' by hand)
+    get_email_index().rebuild()
+    print(f"{len(get_email_index()._load())} emails indexed")
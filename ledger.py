@@ -0,0 +1,200 @@
+import os
+import json
+import time
+from utils import file_lock
+
+class LedgerError(Exception):
+    """
+    A movement the ledger can't record (no account for the card, not enough balance). The message is meant for the user.
+    """
+
+
+def cents(amount) -> int:
+    """
+    255.5 -> 25550. Balances are kept in integer cents, so thousands of payments don't drift
+    """
+    return round(float(amount) * 100)
+
+
+class Ledger:
+    """
+    Append-only record of every balance movement, one 'card_id<TAB>cents<TAB>kind<TAB>reference<TAB>timestamp' line each
+    (negative cents for payments). Paying is a single append and nothing is ever rewritten, so every balance keeps its history.
+
+    Balances are served from an in-memory view ({card_id: cents}), kept up to date by reading only the lines added since
+    (by this terminal or any other one). Every 'snapshot_every' lines the view is saved to a snapshot together with the
+    ledger offset it covers, so a restart only reads the lines after it.
+    """
+    def __init__(self, path:str="ledger.log", snapshot_path:str="ledger.snapshot", snapshot_every:int=10_000):
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self.snapshot_every = snapshot_every
+        self._balances = None
+        self._offset = 0  # How much of the ledger is already in '_balances'
+        self._since_snapshot = 0
+
+    def _read_snapshot(self) -> tuple[dict, int]:
+        try:
+            with open(self.snapshot_path, "r") as file:
+                snapshot = json.load(file)
+            return snapshot["balances"], snapshot["offset"]
+        except (FileNotFoundError, ValueError, KeyError):
+            # No snapshot yet (or a broken one), the whole ledger is read
+            return {}, 0
+
+    def _load(self) -> dict:
+        if self._balances is None:
+            with file_lock(self.path):
+                # First run, open an account for every user we already have (only once, other terminals may be starting too)
+                if not os.path.exists(self.path):
+                    self.rebuild()
+            self._balances, self._offset = self._read_snapshot()
+
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            size = 0
+        if size < self._offset:
+            # The ledger was replaced by a shorter one (i.e: restored from a backup), the snapshot doesn't match it
+            self._balances, self._offset = {}, 0
+
+        if size > self._offset:
+            with open(self.path, "rb") as file:
+                file.seek(self._offset)
+                # A line another terminal is still writing (no line break yet) is read next time
+                while (line := file.readline()).endswith(b"\n"):
+                    card_id, amount, _ = line.split(b"\t", 2)
+                    card_id = card_id.decode("utf-8")
+                    self._balances[card_id] = self._balances.get(card_id, 0) + int(amount)
+                    self._offset = file.tell()
+                    self._since_snapshot += 1
+
+        return self._balances
+
+    def _append(self, card_id:str, amount:int, kind:str, reference:str="") -> None:
+        # Callers hold the ledger lock
+        with open(self.path, "a") as file:
+            file.write(f"{card_id}\t{amount}\t{kind}\t{reference}\t{time.time():.3f}\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+        self._load()
+        if self._since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def _account(self, card_id:str) -> int | None:
+        """
+        Balance of the card in cents. Users added to the store after the ledger was built (i.e: by hand, or by a migration)
+        get their account opened here, with the balance stored in the 'users' table. None if there's no such user.
+        """
+        if (balance := self._load().get(card_id)) is not None:
+            return balance
+
+        # Imported here, the store is only read for cards the ledger doesn't know yet
+        from storage import get_storage
+
+        if (user := get_storage().find_one("users", "card_id", card_id)) is None:
+            return None
+        self.open_account(card_id, cents(user["balance"] or 0))
+        return self._balances.get(card_id)
+
+    def balance(self, card_id:str) -> int | None:
+        """
+        Balance of the card in cents, or None if the card has no account
+        """
+        return self._account(card_id)
+
+    def open_account(self, card_id:str, amount:int) -> None:
+        """
+        Records the opening balance of a card. Cards that already have an account keep it.
+        """
+        with file_lock(self.path):
+            if card_id not in self._load():
+                self._append(card_id, amount, "opening")
+
+    def credit(self, card_id:str, amount:int, reference:str="", kind:str="credit") -> int:
+        """
+        Adds 'amount' cents to the card (i.e: a top-up, or 'refund' for a payment whose order couldn't be placed)
+        """
+        with file_lock(self.path):
+            if self._account(card_id) is None:
+                raise LedgerError(f"No account for card {card_id}")
+            self._append(card_id, amount, kind, reference)
+            return self._balances[card_id]
+
+    def debit(self, card_id:str, amount:int, reference:str="") -> int:
+        """
+        Charges 'amount' cents to the card. Returns the new balance, or raises if it's not enough.
+        """
+        # Other terminals may be charging the same card, the balance is checked and charged under the same lock
+        with file_lock(self.path):
+            balance = self._account(card_id)
+            if balance is None:
+                raise LedgerError(f"No account for card {card_id}")
+            if balance < amount:
+                raise LedgerError(f"You don't have enough balance! ({balance / 100:.2f} to pay {amount / 100:.2f})")
+            self._append(card_id, -amount, "payment", reference)
+            return self._balances[card_id]
+
+    def history(self, card_id:str) -> list[dict]:
+        """
+        Every movement of the card, oldest first. Reads the whole ledger, it's meant for audits, not for the prompt.
+        """
+        entries = []
+        with open(self.path, "r") as file:
+            for line in file:
+                if line.startswith(card_id + "\t") and line.endswith("\n"):
+                    _, amount, kind, reference, timestamp = line.rstrip("\n").split("\t")
+                    entries.append({"cents": int(amount), "kind": kind, "reference": reference, "timestamp": float(timestamp)})
+        return entries
+
+    def snapshot(self) -> None:
+        """
+        Saves the current view, so the next start doesn't read the ledger lines before it
+        """
+        with file_lock(self.path):
+            self._load()
+            with open(self.snapshot_path + ".tmp", "w") as file:
+                json.dump({"offset": self._offset, "balances": self._balances}, file)
+            os.replace(self.snapshot_path + ".tmp", self.snapshot_path)
+            self._since_snapshot = 0
+
+    def rebuild(self) -> None:
+        """
+        (Re)creates the ledger with an opening line per user, with the balance stored in the 'users' table
+        """
+        # Imported here, the store is only read to open the accounts
+        from storage import get_storage
+
+        with file_lock(self.path):
+            with open(self.path + ".tmp", "w") as file:
+                for user in get_storage().stream("users"):
+                    file.write(f"{user['card_id']}\t{cents(user['balance'] or 0)}\topening\t\t{time.time():.3f}\n")
+            os.replace(self.path + ".tmp", self.path)
+            if os.path.exists(self.snapshot_path):
+                os.remove(self.snapshot_path)
+
+        self._balances = None
+        self._offset = 0
+        self._since_snapshot = 0
+
+
+_ledger = None
+
+def get_ledger() -> Ledger:
+    global _ledger
+    if _ledger is None:
+        _ledger = Ledger("ledger.log", "ledger.snapshot")
+    return _ledger
+
+
+if __name__ == "__main__":
+    # Usage: python ledger.py [CARD_ID] -> Saves a snapshot of every balance, or prints the history of a card
+    import sys
+    if len(sys.argv) > 1:
+        for entry in get_ledger().history(sys.argv[1]):
+            print(f"{entry['timestamp']:.0f}  {entry['kind']:<8} {entry['cents'] / 100:>10.2f}  {entry['reference']}")
+        print(f"Balance: {(get_ledger().balance(sys.argv[1]) or 0) / 100:.2f}")
+    else:
+        get_ledger().snapshot()
+        print(f"{len(get_ledger()._load())} balances saved")
@@ -0,0 +1,131 @@
+import os
+import time
+import uuid
+import queue
+import atexit
+import smtplib
+import threading
+from email import message_from_bytes, policy
+from email.message import EmailMessage
+from metrics import timer
+
+class Mailer:
+    """
+    Outbound mail queue. 'send' only writes the message into the spool directory and returns, so the prompt never waits for SMTP.
+    Background workers deliver the spooled messages, each one reusing its SMTP connection between messages,
+    and retry failed deliveries with an exponential backoff. Messages still in the spool when the app exits are sent on the next run.
+    """
+    def __init__(self, host:str, port:int, username:str="", password:str="", use_ssl:bool=True, spool:str="mail_spool", workers:int=1, max_retries:int=5, backoff:float=2.0):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.spool = spool
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.queue = queue.Queue()
+
+        os.makedirs(self.spool, exist_ok=True)
+        # Messages left behind by a previous run go first
+        for name in sorted(os.listdir(self.spool)):
+            if name.endswith(".eml"):
+                self.queue.put(os.path.join(self.spool, name))
+
+        self.workers = [threading.Thread(target=self._work, daemon=True) for _ in range(workers)]
+        for worker in self.workers:
+            worker.start()
+
+    def send(self, message:EmailMessage) -> bool:
+        """
+        Spools the message for delivery and returns right away
+        """
+        if message["From"] is None and self.username:
+            message["From"] = self.username
+
+        path = os.path.join(self.spool, f"{time.time_ns()}-{uuid.uuid4().hex[:8]}.eml")
+        try:
+            # Written under a temporary name first, so a worker never picks up half a message
+            with open(path + ".tmp", "wb") as file:
+                file.write(message.as_bytes())
+            os.replace(path + ".tmp", path)
+        except OSError as error:
+            print(f"Internal error: Couldn't queue the email. Send this error to the developer: {error}")
+            return False
+
+        self.queue.put(path)
+        return True
+
+    def wait(self, timeout:float | None=None) -> bool:
+        """
+        Waits until every queued message was handled. Returns False if 'timeout' seconds went by first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def _connect(self) -> smtplib.SMTP:
+        if self.use_ssl:
+            connection = smtplib.SMTP_SSL(self.host, self.port, timeout=30)
+        else:
+            connection = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.username:
+            connection.login(self.username, self.password)
+        return connection
+
+    def _work(self) -> None:
+        connection = None
+        while True:
+            path = self.queue.get()
+            try:
+                with open(path, "rb") as file:
+                    message = message_from_bytes(file.read(), policy=policy.default)
+            except OSError:
+                # Already delivered by another worker
+                self.queue.task_done()
+                continue
+
+            for attempt in range(self.max_retries):
+                if attempt > 0:
+                    time.sleep(self.backoff ** (attempt - 1))
+                try:
+                    with timer("smtp_send"):
+                        if connection is None:
+                            connection = self._connect()
+                        connection.send_message(message)
+                except (smtplib.SMTPException, OSError):
+                    # Drop the connection (it may have timed out while idle) and try again
+                    if connection is not None:
+                        try:
+                            connection.close()
+                        except Exception:
+                            pass
+                    connection = None
+                else:
+                    os.remove(path)
+                    break
+
+            # If every attempt failed the message stays in the spool, and is retried on the next run
+            self.queue.task_done()
+
+
+_mailer = None
+
+def get_mailer() -> Mailer:
+    global _mailer
+    if _mailer is None:
+        _mailer = Mailer(
+            host=os.environ.get("HARVOFFE_SMTP_HOST", "smtp.gmail.com"),
+            port=int(os.environ.get("HARVOFFE_SMTP_PORT", 465)),
+            username=os.environ.get("HARVOFFE_SMTP_USER", "[YOUR GMAIL ADDRESS]"),
+            password=os.environ.get("HARVOFFE_SMTP_PASSWORD", "[YOUR APP PASSWORD]"),
+            use_ssl=os.environ.get("HARVOFFE_SMTP_SSL", "1") == "1",
+            # One spool per terminal, so two kiosks never send the same message
+            spool=os.path.join(os.environ.get("HARVOFFE_MAIL_SPOOL", "mail_spool"), os.environ.get("HARVOFFE_TERMINAL", "default")),
+        )
+        # Give the queue a few seconds to deliver before exiting, whatever is left is sent on the next run
+        atexit.register(_mailer.wait, 5)
+    return _mailer
@@ -0,0 +1,160 @@
+import os
+import time
+import bisect
+import atexit
+import functools
+import threading
+from contextlib import contextmanager
+
+# Upper bounds (in seconds) of the latency histogram buckets, from a cached lookup to a slow SMTP server
+BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """
+    Latency histogram with fixed buckets: recording a value is one binary search and one increment, whatever the volume
+    """
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        # One extra bucket for anything slower than the last bound (+Inf)
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds:float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q:float) -> float:
+        """
+        Approximated by the upper bound of the bucket the quantile falls in (i.e: 0.99 -> 0.025 means 'p99 <= 25ms')
+        """
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """
+    Counters and latency histograms of the hot paths (CSV reads and writes, bcrypt, emails, audio, payments).
+    Shown with the '--stats' shortcut, and exported in the Prometheus text format.
+    """
+    def __init__(self, prefix:str="harvoffe"):
+        self.prefix = prefix
+        self.counters:dict[str, int] = {}
+        self.histograms:dict[str, Histogram] = {}
+        # Audio and mail record from their own threads
+        self.lock = threading.Lock()
+
+    def increment(self, name:str, amount:int=1) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name:str, seconds:float) -> None:
+        with self.lock:
+            if (histogram := self.histograms.get(name)) is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name:str):
+        """
+        Times the block into the 'name' histogram. Blocks that raise are counted in '<name>_errors' too.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.increment(f"{name}_errors")
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def summary(self) -> list[dict]:
+        """
+        One row per histogram and counter, ready for 'render_table'
+        """
+        with self.lock:
+            rows = [
+                {
+                    "metric": name,
+                    "count": histogram.count,
+                    "mean_ms": round(histogram.sum / histogram.count * 1000, 2),
+                    "p50_ms": histogram.quantile(0.50) * 1000,
+                    "p95_ms": histogram.quantile(0.95) * 1000,
+                    "p99_ms": histogram.quantile(0.99) * 1000,
+                    "total_s": round(histogram.sum, 3),
+                }
+                for name, histogram in sorted(self.histograms.items())
+            ]
+            rows += [{"metric": name, "count": count} for name, count in sorted(self.counters.items())]
+        return rows
+
+    def prometheus(self) -> str:
+        """
+        Every metric in the Prometheus text exposition format
+        """
+        lines = []
+        with self.lock:
+            for name, count in sorted(self.counters.items()):
+                lines += [f"# TYPE {self.prefix}_{name}_total counter", f"{self.prefix}_{name}_total {count}"]
+
+            for name, histogram in sorted(self.histograms.items()):
+                metric = f"{self.prefix}_{name}_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                # Buckets are cumulative in Prometheus
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+                lines += [
+                    f'{metric}_bucket{{le="+Inf"}} {histogram.count}',
+                    f"{metric}_sum {histogram.sum}",
+                    f"{metric}_count {histogram.count}",
+                ]
+        return "\n".join(lines) + "\n"
+
+    def export(self, file:str) -> None:
+        """
+        Writes the Prometheus text into 'file' at once, so a scraper (i.e: node_exporter's textfile collector) never reads half of it
+        """
+        with open(file + ".tmp", "w") as temp_file:
+            temp_file.write(self.prometheus())
+        os.replace(file + ".tmp", file)
+
+
+_metrics = None
+
+def get_metrics() -> Metrics:
+    """
+    Returns the metrics of this process. If 'HARVOFFE_METRICS_FILE' is set, they're exported into it on exit too.
+    """
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+        if file := os.environ.get("HARVOFFE_METRICS_FILE"):
+            atexit.register(_metrics.export, file)
+    return _metrics
+
+def timer(name:str):
+    """
+    with timer("read_csv"): ...
+    """
+    return get_metrics().timer(name)
+
+def timed(name:str):
+    """
+    Decorator version of 'timer', i.e: @timed("read_csv")
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with get_metrics().timer(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,164 @@
+import os
+import time
+import secrets
+from utils import file_lock
+
+# Pickup codes are read out loud and typed by hand, so there's no 0/O nor 1/I
+ALPHABET = "23456789ABCDEFGHJKLMNPQRSTUVWXYZ"
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+EPOCH_MS = 1735689600000  # 2025-01-01 00:00:00 UTC
+
+def base36(number:int, width:int) -> str:
+    """
+    (35, 2) -> '0Z'. Fixed width, so IDs sort as text in the same order as their numbers
+    """
+    digits = []
+    for _ in range(width):
+        number, digit = divmod(number, 36)
+        digits.append(DIGITS[digit])
+    return "".join(reversed(digits))
+
+
+class OrderIds:
+    """
+    Allocates order IDs and pickup codes, unique across every terminal sharing the directory, without reading 'orders.csv'.
+
+    Order IDs are 12 characters in base 36: milliseconds since 2025 (8), the terminal's node (2) and a sequence within
+    the millisecond (2), so they sort by the time they were placed. Customers are given a 6 character pickup code instead,
+    drawn at random and checked against every code (and every old 6 character order ID) handed out before.
+
+    Layout of the directory:
+        nodes.index  ->  One 'terminal<TAB>node' line per terminal that ever placed an order
+        codes.index  ->  One 'code<TAB>order_id' line per order, the uniqueness index
+    """
+    CODE_LENGTH = 6
+
+    def __init__(self, directory:str="order_ids", terminal:str="default"):
+        self.directory = directory
+        self.terminal = terminal
+        self._node = None
+        self._codes = None  # code -> order id
+        self._orders = {}  # order id -> code
+        self._offset = 0  # How much of 'codes.index' is already loaded
+        self._last = (0, -1)  # Millisecond and sequence of the last ID allocated here
+        # Lock files live next to the indexes, so the directory has to exist before anything is locked
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def nodes_path(self) -> str:
+        return os.path.join(self.directory, "nodes.index")
+
+    @property
+    def codes_path(self) -> str:
+        return os.path.join(self.directory, "codes.index")
+
+    @property
+    def node(self) -> str:
+        """
+        Two characters that tell this terminal's IDs apart, given once and kept in 'nodes.index'
+        """
+        if self._node is None:
+            with file_lock(self.nodes_path):
+                nodes = {}
+                if os.path.exists(self.nodes_path):
+                    with open(self.nodes_path, "r") as file:
+                        for line in file:
+                            terminal, node = line.rstrip("\n").split("\t")
+                            nodes[terminal] = node
+
+                if self.terminal not in nodes:
+                    if len(nodes) >= 36 ** 2:
+                        raise ValueError(f"No node left for terminal '{self.terminal}'")
+                    nodes[self.terminal] = base36(len(nodes), 2)
+                    with open(self.nodes_path, "a") as file:
+                        file.write(f"{self.terminal}\t{nodes[self.terminal]}\n")
+                self._node = nodes[self.terminal]
+        return self._node
+
+    def _load(self) -> dict:
+        if self._codes is None:
+            with file_lock(self.codes_path):
+                # First run, reserve the IDs of the orders we already have (only once, other terminals may be starting too)
+                if not os.path.exists(self.codes_path):
+                    self.rebuild()
+            self._codes = {}
+
+        # Only read the codes added since the last call (by this terminal or by any other one)
+        with open(self.codes_path, "r") as file:
+            file.seek(self._offset)
+            while (line := file.readline()).endswith("\n"):
+                code, order_id = line.rstrip("\n").split("\t")
+                self._codes[code] = order_id
+                self._orders[order_id] = code
+                self._offset = file.tell()
+        return self._codes
+
+    def _next_id(self) -> str:
+        now = int(time.time() * 1000) - EPOCH_MS
+        millisecond, sequence = self._last
+        if now > millisecond:
+            millisecond, sequence = now, 0
+        else:
+            # Same millisecond (or the clock went back), keep counting on the last one so IDs never go backwards
+            sequence += 1
+            if sequence == 36 ** 2:
+                millisecond, sequence = millisecond + 1, 0
+        self._last = (millisecond, sequence)
+        return base36(millisecond, 8) + self.node + base36(sequence, 2)
+
+    def allocate(self) -> tuple[str, str]:
+        """
+        Returns a new order ID and its pickup code
+        """
+        with file_lock(self.codes_path):
+            codes = self._load()
+            # Another process running as the same terminal may have taken it
+            while (order_id := self._next_id()) in self._orders:
+                pass
+            while (code := "".join(secrets.choice(ALPHABET) for _ in range(self.CODE_LENGTH))) in codes:
+                pass
+
+            with open(self.codes_path, "a") as file:
+                file.write(f"{code}\t{order_id}\n")
+            self._load()
+        return order_id, code
+
+    def resolve(self, text:str) -> str:
+        """
+        Order ID of a pickup code. Order IDs (and orders placed before pickup codes existed) are returned as they are.
+        """
+        text = text.strip().upper()
+        return self._load().get(text, text)
+
+    def code(self, order_id:str) -> str:
+        """
+        Pickup code of an order, or its ID if it was placed before pickup codes existed
+        """
+        self._load()
+        return self._orders.get(order_id, order_id)
+
+    def rebuild(self) -> None:
+        """
+        (Re)creates the uniqueness index with every order in the store, each one being its own code
+        """
+        # Imported here, the store is only read to build the index
+        from storage import get_storage
+
+        with file_lock(self.codes_path):
+            with open(self.codes_path + ".tmp", "w") as file:
+                for order in get_storage().stream("orders"):
+                    file.write(f"{order['id']}\t{order['id']}\n")
+            os.replace(self.codes_path + ".tmp", self.codes_path)
+
+        self._codes = None
+        self._orders = {}
+        self._offset = 0
+
+
+_order_ids = None
+
+def get_order_ids() -> OrderIds:
+    global _order_ids
+    if _order_ids is None:
+        _order_ids = OrderIds("order_ids", os.environ.get("HARVOFFE_TERMINAL", "default"))
+    return _order_ids
@@ -0,0 +1,99 @@
+import json
+import base64
+import struct
+import itertools
+from storage import get_storage
+from classes.menu import get_menu
+
+# Carts are saved as 'c1:' + base64 of one record per line: menu id, unit price in cents and quantity
+CART_PREFIX = "c1:"
+CART_LINE = struct.Struct("<HII")
+
+def cents(price) -> int:
+    return round(float(price) * 100)
+
+def encode_cart(cart:list[dict]) -> str:
+    """
+    [{"coffee": "Latte", "price": 4.5, "quantity": 2}] -> 'c1:AwDCAQAAAgAAAA=='
+    Carts holding a coffee that isn't in the menu anymore are kept as JSON, so nothing is lost.
+    """
+    menu = get_menu()
+    records = []
+    for item in cart:
+        if (found := menu.get(item["coffee"])) is None:
+            return json.dumps(cart)
+        records.append(CART_LINE.pack(found["id"], cents(item["price"]), item["quantity"]))
+    return CART_PREFIX + base64.b64encode(b"".join(records)).decode("ascii")
+
+def decode_cart(text:str) -> list[dict]:
+    """
+    Reverse of 'encode_cart'. Carts saved as JSON (before carts were encoded) are read too.
+    """
+    if not text.startswith(CART_PREFIX):
+        return json.loads(text) if text else []
+
+    menu = get_menu()
+    cart = []
+    for menu_id, price, quantity in CART_LINE.iter_unpack(base64.b64decode(text[len(CART_PREFIX):])):
+        # Coffees removed from the menu are dropped from the cart, they can't be ordered anymore
+        if item := menu.by_id(menu_id):
+            cart.append({"coffee": item["coffee"], "price": price / 100, "quantity": quantity})
+    return cart
+
+def to_rows(order_id:str, items:list[dict]) -> list[dict]:
+    """
+    Items of an order ({"coffee", "price", "quantity"}) -> rows of the 'order_lines' table
+    """
+    menu = get_menu()
+    return [
+        {"order_id": order_id, "menu_id": menu.get(item["coffee"])["id"], "price_cents": cents(item["price"]), "quantity": item["quantity"]}
+        for item in items
+    ]
+
+def from_rows(rows:list[dict]) -> list[dict]:
+    """
+    Rows of the 'order_lines' table -> items of the order ({"coffee", "price", "quantity"})
+    """
+    menu = get_menu()
+    items = []
+    for row in rows:
+        item = menu.by_id(int(row["menu_id"]))
+        items.append({
+            # The line keeps its price even if the coffee was removed from the menu since then
+            "coffee": item["coffee"] if item else f"Item #{row['menu_id']}",
+            "price": int(row["price_cents"]) / 100,
+            "quantity": int(row["quantity"]),
+        })
+    return items
+
+def get_items(order:dict) -> list[dict]:
+    """
+    Items of a stored order. Orders placed before order lines existed still have them as JSON in their 'items' column.
+    """
+    if order["items"]:
+        return json.loads(order["items"])
+    return from_rows(get_storage().find("order_lines", "order_id", order["id"]))
+
+def stream_orders(storage=None):
+    """
+    Yields every stored order with its 'items' as a list (None if they can't be parsed), without loading either table.
+
+    The lines of an order are appended all at once, before the order itself, so they're read in the same order as the orders.
+    Orders placed at the same time by different terminals may interleave, the few lines read ahead are kept until their order comes.
+    """
+    storage = storage or get_storage()
+    groups = itertools.groupby(storage.stream("order_lines"), key=lambda row: row["order_id"])
+    pending = {}
+
+    for order in storage.stream("orders"):
+        order = dict(order)
+        if order["items"]:
+            try:
+                order["items"] = json.loads(order["items"])
+            except ValueError:
+                order["items"] = None
+        else:
+            while order["id"] not in pending and (group := next(groups, None)) is not None:
+                pending.setdefault(group[0], []).extend(group[1])
+            order["items"] = from_rows(pending.pop(order["id"], []))
+        yield order
@@ -0,0 +1,149 @@
+import os
+import json
+from datetime import datetime
+from utils import file_lock
+
+class OrderLog:
+    """
+    Append-only log of placed orders, split into segment files, plus an index of where each user's orders live.
+    'orders.csv' is still the record of every order; this log only exists to read one user's history without scanning the rest.
+
+    Layout of the log directory:
+        segment-000001.log  ->  One JSON order per line, never rewritten
+        index.log           ->  One 'card_id<TAB>segment<TAB>offset<TAB>timestamp' line per order
+    """
+    DATE_FORMAT = "%b %d, %Y %H:%M:%S"
+
+    def __init__(self, directory:str="order_log", segment_size:int=1_000_000):
+        self.directory = directory
+        self.segment_size = segment_size
+        self._index = None  # {card_id: [(timestamp, segment, offset), ...]}
+        self._index_offset = 0  # How much of 'index.log' is already loaded in '_index'
+        self._segment = 1
+
+    def _segment_path(self, segment:int) -> str:
+        return os.path.join(self.directory, f"segment-{segment:06d}.log")
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.directory, "index.log")
+
+    def _load_index(self) -> dict:
+        if self._index is None:
+            # First load, under the lock: a log another terminal is still building is read once it's complete
+            os.makedirs(self.directory, exist_ok=True)
+            with file_lock(self.index_path):
+                if not os.path.exists(self.index_path):
+                    # First time the log is used, build it from the orders we already have
+                    self.rebuild()
+                if self._index is None:
+                    self._index = {}
+                return self._tail_index()
+        return self._tail_index()
+
+    def _tail_index(self) -> dict:
+        # Only read the index lines added since the last call (by this terminal or by any other one)
+        with open(self.index_path, "r") as file:
+            file.seek(self._index_offset)
+            while (line := file.readline()).endswith("\n"):
+                card_id, segment, offset, timestamp = line.rstrip("\n").split("\t")
+                self._index.setdefault(card_id, []).append((float(timestamp), int(segment), int(offset)))
+                self._segment = max(self._segment, int(segment))
+                self._index_offset = file.tell()
+
+        return self._index
+
+    def rebuild(self) -> None:
+        """
+        (Re)creates the log from every order stored in 'orders.csv'
+        """
+        # Imported here so the log doesn't depend on a storage backend unless it has to backfill
+        from order_lines import stream_orders
+
+        os.makedirs(self.directory, exist_ok=True)
+        # Other terminals wait until the log is complete, instead of appending to (or rebuilding) half of it
+        with file_lock(self.index_path):
+            for name in os.listdir(self.directory):
+                # The lock file stays, it's the one we hold
+                if name.endswith(".log"):
+                    os.remove(os.path.join(self.directory, name))
+
+            self._index = {}
+            self._index_offset = 0
+            self._segment = 1
+            # Create an empty index, so an empty log isn't rebuilt again next time
+            open(self.index_path, "w").close()
+
+            for order in stream_orders():
+                self.append(order)
+
+    def append(self, order:dict) -> None:
+        """
+        Appends an order at the end of the current segment and records its position in the index.
+        Expects the order to be already stored in 'orders.csv'.
+        """
+        if self._index is None and not os.path.exists(self.index_path):
+            # The log is built for the first time from 'orders.csv', which already includes this order
+            self._load_index()
+            return
+
+        record = {**order, "timestamp": order.get("timestamp") or self.to_timestamp(order["date"])}
+        line = (json.dumps(record) + "\n").encode("utf-8")
+
+        # Other terminals may be appending to the same log
+        with file_lock(self.index_path):
+            # Catch up with the index, so we write into the latest segment
+            self._load_index()
+
+            path = self._segment_path(self._segment)
+            if os.path.exists(path) and os.path.getsize(path) + len(line) > self.segment_size:
+                # Current segment is full, start the next one
+                self._segment += 1
+                path = self._segment_path(self._segment)
+
+            with open(path, "ab") as file:
+                file.seek(0, os.SEEK_END)
+                offset = file.tell()
+                file.write(line)
+
+            with open(self.index_path, "a") as file:
+                file.write(f"{record['card_id']}\t{self._segment}\t{offset}\t{record['timestamp']}\n")
+
+    def count(self, card_id:str) -> int:
+        return len(self._load_index().get(card_id, []))
+
+    def get(self, card_id:str, page:int=1, per_page:int=10) -> list[dict]:
+        """
+        Returns one page of the user's orders, sorted from the latest to the oldest.
+        Only the orders in that page are read from disk.
+        """
+        entries = sorted(self._load_index().get(card_id, []), reverse=True)
+        start = (page - 1) * per_page
+        orders = []
+
+        for timestamp, segment, offset in entries[start:start + per_page]:
+            with open(self._segment_path(segment), "rb") as file:
+                file.seek(offset)
+                orders.append(json.loads(file.readline()))
+
+        return orders
+
+    @classmethod
+    def to_timestamp(cls, date:str) -> float:
+        """
+        Turns an order 'date' ('Nov 03, 2025 19:28:01') into a POSIX timestamp, so orders sort chronologically
+        """
+        try:
+            return datetime.strptime(date, cls.DATE_FORMAT).timestamp()
+        except ValueError:
+            # Older orders may only have the day
+            return datetime.strptime(date, "%b %d, %Y").timestamp()
+
+
+_order_log = None
+
+def get_order_log() -> OrderLog:
+    global _order_log
+    if _order_log is None:
+        _order_log = OrderLog(os.environ.get("HARVOFFE_ORDER_LOG", "order_log"))
+    return _order_log
@@ -0,0 +1,169 @@
+import os
+import time
+import heapq
+from collections import deque
+from utils import file_lock
+from metrics import get_metrics
+
+class QueueError(Exception):
+    """
+    A claim or completion that can't be done (unknown order, already claimed, ...). The message is meant for the barista.
+    """
+
+
+class PickupQueue:
+    """
+    Paid orders waiting to be prepared, shared by every terminal: customers' terminals add them, baristas claim and complete them.
+
+    The queue is a heap ordered by when each order should be ready (placed time + estimated preparation time of its items),
+    so quick orders don't wait behind a big one placed a moment earlier. Adding, claiming the next order and completing one
+    are O(log n): claimed and completed orders are dropped from the heap once they reach its top.
+
+    Every change is a line appended to 'pickup_queue.log', and the in-memory queue only reads the lines added since
+    (by this terminal or any other one):
+        placed<TAB>order_id<TAB>time<TAB>pickup code<TAB>client<TAB>prep seconds
+        claimed<TAB>order_id<TAB>time<TAB>barista
+        completed<TAB>order_id<TAB>time
+    """
+    def __init__(self, path:str="pickup_queue.log", window:int=3600):
+        self.path = path
+        self.window = window  # Seconds of history the throughput is measured over
+        self._orders:dict[str, dict] = {}
+        self._heap:list[tuple] = []  # (ready by, placed, order_id)
+        self._claims:deque = deque()  # (claimed, seconds waited), oldest first
+        self._completions:deque = deque()  # Completion times, oldest first
+        self._offset = 0  # How much of the log is already applied
+
+    def _apply(self, event:str, order_id:str, at:float, fields:list[str]) -> None:
+        if event == "placed":
+            pickup, client, prep = fields
+            self._orders[order_id] = {"id": order_id, "pickup": pickup, "client": client, "placed": at, "prep": int(prep), "status": "queued"}
+            heapq.heappush(self._heap, (at + int(prep), at, order_id))
+        elif (order := self._orders.get(order_id)) is None:
+            # Placed before the log was cleared, nothing to track
+            return
+        elif event == "claimed":
+            order.update(status="claimed", claimed=at, barista=fields[0] if fields else "")
+            self._claims.append((at, at - order["placed"]))
+        elif event == "completed":
+            # Done, only its completion time is kept for the throughput
+            del self._orders[order_id]
+            self._completions.append(at)
+
+    def _load(self) -> None:
+        try:
+            file = open(self.path, "r")
+        except FileNotFoundError:
+            return
+        with file:
+            file.seek(self._offset)
+            # A line another terminal is still writing (no line break yet) is read next time
+            while (line := file.readline()).endswith("\n"):
+                event, order_id, at, *fields = line.rstrip("\n").split("\t")
+                self._apply(event, order_id, float(at), fields)
+                self._offset = file.tell()
+
+    def _append(self, *fields) -> None:
+        # Callers hold the queue lock
+        with open(self.path, "a") as file:
+            file.write("\t".join(str(field) for field in fields) + "\n")
+        self._load()
+
+    @staticmethod
+    def estimate(items:list[dict]) -> int:
+        """
+        Seconds the baristas need to prepare the items, from the preparation time of each coffee in the menu
+        """
+        # Break the circular import
+        from classes.menu import get_menu
+
+        menu = get_menu()
+        seconds = 0
+        for item in items:
+            found = menu.get(item["coffee"])
+            seconds += (found["prep_seconds"] if found else menu.PREP_SECONDS) * int(item["quantity"])
+        return seconds
+
+    def add(self, order_id:str, pickup:str, client:str, items:list[dict]) -> None:
+        with file_lock(self.path):
+            self._append("placed", order_id, f"{time.time():.3f}", pickup, client, self.estimate(items))
+        get_metrics().increment("pickup_placed")
+
+    def claim(self, order_id:str | None=None, barista:str="") -> dict:
+        """
+        A barista starts preparing the order, or the next one in the queue if no ID is given
+        """
+        # Other baristas may be claiming at the same time, the order is checked and claimed under the same lock
+        with file_lock(self.path):
+            self._load()
+            if order_id is None:
+                # Orders claimed or completed since they were queued are dropped on the way
+                while self._heap and self._orders.get(self._heap[0][2], {}).get("status") != "queued":
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    raise QueueError("There are no orders waiting")
+                order_id = self._heap[0][2]
+
+            if (order := self._orders.get(order_id)) is None:
+                raise QueueError(f"Order {order_id} isn't in the queue")
+            if order["status"] != "queued":
+                raise QueueError(f"Order {order_id} was already claimed by {order['barista'] or 'another barista'}")
+            self._append("claimed", order_id, f"{time.time():.3f}", barista)
+
+        get_metrics().increment("pickup_claimed")
+        return dict(order)
+
+    def complete(self, order_id:str) -> dict:
+        """
+        The order is ready to be picked up
+        """
+        with file_lock(self.path):
+            self._load()
+            if (order := self._orders.get(order_id)) is None:
+                raise QueueError(f"Order {order_id} isn't in the queue")
+            self._append("completed", order_id, f"{time.time():.3f}")
+
+        get_metrics().increment("pickup_completed")
+        return order
+
+    def waiting(self, limit:int=20) -> list[dict]:
+        """
+        The next 'limit' orders to prepare, in the order they should be claimed
+        """
+        self._load()
+        queued = (entry for entry in self._heap if self._orders.get(entry[2], {}).get("status") == "queued")
+        return [dict(self._orders[order_id]) for _, _, order_id in heapq.nsmallest(limit, queued)]
+
+    def in_progress(self) -> list[dict]:
+        self._load()
+        return sorted((dict(order) for order in self._orders.values() if order["status"] == "claimed"), key=lambda order: order["claimed"])
+
+    def stats(self, now:float | None=None) -> dict:
+        """
+        Throughput over the last 'window' seconds: orders completed per hour and the 95th percentile of the time orders
+        waited in the queue before a barista claimed them
+        """
+        self._load()
+        now = now or time.time()
+        # Anything older than the window doesn't count anymore
+        while self._claims and self._claims[0][0] < now - self.window:
+            self._claims.popleft()
+        while self._completions and self._completions[0] < now - self.window:
+            self._completions.popleft()
+
+        waits = sorted(wait for _, wait in self._claims)
+        return {
+            "queued": sum(order["status"] == "queued" for order in self._orders.values()),
+            "in_progress": sum(order["status"] == "claimed" for order in self._orders.values()),
+            "orders_per_hour": round(len(self._completions) * 3600 / self.window, 1),
+            "wait_p95_s": round(waits[min(len(waits) - 1, round(0.95 * (len(waits) - 1)))], 1) if waits else 0.0,
+        }
+
+
+_pickup_queue = None
+
+def get_pickup_queue() -> PickupQueue:
+    global _pickup_queue
+    if _pickup_queue is None:
+        _pickup_queue = PickupQueue("pickup_queue.log")
+    return _pickup_queue
@@ -1,54 +1,216 @@
 import sys
-import re
-from pyfiglet import Figlet
-from tabulate import tabulate
+import os
+import time
 from classes.user import User
 from classes.cart import Cart
 from classes.order import Order
-from utils import colored_text, read_csv, title_keys, speak
+from classes.barista import Barista
+from classes.menu import get_menu
+from classes.order_service import OrderService, OrderError
+from storage import get_storage
+from cart_buffer import get_cart_buffer
+from render_cache import get_render_cache
+from commands import CommandRegistry
+from metrics import get_metrics
+from utils import colored_text, read_csv, render_table, speak
 
 def main():
+    if "--profile-startup" in sys.argv:
+        return print(profile_startup())
+    if "--replay" in sys.argv:
+        return print(replay(sys.argv[sys.argv.index("--replay") + 1]))
+    if "--report" in sys.argv:
+        # '--report csv|json [DIRECTORY]'
+        index = sys.argv.index("--report") + 1
+        return print(report(*sys.argv[index:index + 2]))
+    if "--serve" in sys.argv:
+        # Optional 'HOST:PORT' right after the flag
+        from server import serve
+        index = sys.argv.index("--serve") + 1
+        return serve(*sys.argv[index:index + 1])
+
     speak(text="Welcome to Harvoffe!")
     print(banner(), "This is Harvoffe, the coffee shop of Harvard. In this application you'll be able to pythonically order your favorite coffee so you can be awake in class!", sep="\n", end="\n\n")
     print("You're:", colored_text("Online", "success"), end="\n\n") if User.obtain_session() else print("You're:", colored_text("Disconnected", "alert"), end="\n\n")
-    print("\nAvailable Shortcuts:", display_table(file="shortcuts.csv"), sep="\n\n")
+    print("\nAvailable Shortcuts:", commands().table(), sep="\n\n")
+
+    # Used by '--profile-startup', stops right where the user would see the first prompt
+    if "--startup-only" in sys.argv:
+        return
     prompt()
     
 def banner(text:str="Harvoffe", font:str="catwalk"):
+    # Banners rendered before are served from the render cache
+    key = f"banner:{font}:{text}"
+    if isinstance(text, str) and isinstance(font, str) and (cached := get_render_cache().get(key)) is not None:
+        return cached
+
+    # Imported on first use, like every other heavy dependency, to keep the startup fast
+    from pyfiglet import Figlet
     f = Figlet()
     f.setFont(font=font)
-    return f.renderText(text)
+    rendered = f.renderText(text)
+
+    get_render_cache().set(key, rendered)
+    return rendered
 
 def display_table(file:str="") -> str:
+    # The table is rendered again only if the file changed since it was cached
+    stamp = get_render_cache().file_stamp(file)
+    key = f"table:{os.path.abspath(file)}:rounded_grid"
+    if (cached := get_render_cache().get(key, stamp)) is not None:
+        return cached
+
     lines:list[dict] = read_csv(file)
+    rendered = render_table(lines)
+
+    get_render_cache().set(key, rendered, stamp)
+    return rendered
+
+def profile_startup() -> str:
+    """
+    Runs the app up to its first prompt in a fresh interpreter (with '-X importtime'), and reports
+    how long it took and which modules took the longest to import.
+    """
+    import subprocess
+    env = {**os.environ, "HARVOFFE_AUDIO": "off"}
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.abspath(__file__), "--startup-only"],
+        capture_output=True, text=True, env=env
+    )
+    elapsed = (time.perf_counter() - start) * 1000
+
+    # Lines look like: 'import time:       self [us] |  cumulative | imported package'
+    modules = []
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "[us]" not in line:
+            self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+            # Only top level imports, their cumulative time already includes what they import
+            if not name.startswith("  "):
+                modules.append({"module": name.strip(), "import_ms": round(int(cumulative_us) / 1000, 1)})
+
+    modules = sorted(modules, key=lambda module: module["import_ms"], reverse=True)[:15]
+    # The target is for warm starts: the first run (or the first one after editing 'shortcuts.csv') renders the banner
+    # and the shortcuts table with 'pyfiglet' and 'tabulate', and saves them in the render cache for the next ones
+    return f"{render_table(modules)}\n\nTime to first prompt: {elapsed:.1f} ms (target: < 100 ms once the render cache is warm)"
+
+def replay(file:str) -> str:
+    """
+    Runs a file of commands without any prompt (i.e: 'python project.py --replay orders.txt'), one command per line:
+    'Macchiato -q 3' and 'Macchiato -a 1' / '-d 1' modify the cart, '-p' pays it, and '-u CARD_ID' switches to another user.
+    Commands run for the authenticated user until a '-u' line is found. Blank lines and '# comments' are skipped.
+    """
+    service = client = None
+    if user_session := User.obtain_session():
+        service, client = OrderService(user_session["card_id"]), user_session["first"] + " " + user_session["last"]
+
+    commands = orders = 0
+    errors = []
+    start = time.perf_counter()
+
+    with open(file, "r") as lines:
+        for number, command in enumerate(lines, start=1):
+            command = command.strip()
+            if not command or command.startswith("#"):
+                continue
+            commands += 1
+
+            if command.startswith("-u "):
+                card_id = command.split(" ", 1)[1].strip()
+                if user := get_storage().find_one("users", "card_id", card_id):
+                    service, client = OrderService(card_id), user["first"] + " " + user["last"]
+                else:
+                    service = None
+                    errors.append(f"Line {number}: Could not find any user with card '{card_id}'")
+                continue
+
+            if service is None:
+                errors.append(f"Line {number}: No user to run '{command}' for. Authenticate (-auth) or add a '-u CARD_ID' line")
+                continue
+
+            try:
+                if service.execute(command, client):
+                    orders += 1
+            except OrderError as error:
+                errors.append(f"Line {number}: {error}")
+
+    get_cart_buffer().flush()
+    elapsed = time.perf_counter() - start
+
+    summary = f"Replayed {commands} commands in {elapsed:.2f}s: {orders} orders placed ({orders / elapsed if elapsed else 0:.0f} orders/s), {len(errors)} errors"
+    # Long replays may fail thousands of times, the first errors are usually enough to find out why
+    shown = errors[:20] + ([f"... and {len(errors) - 20} more errors"] if len(errors) > 20 else [])
+    return "\n".join(shown + [colored_text(summary, "success" if not errors else "alert")])
+
+def report(format:str="csv", directory:str="reports") -> str:
+    """
+    Sales figures (revenue per day, coffee and customer, top sellers, basket sizes) computed by streaming every order once
+    """
+    # Imported on first use, like every other optional feature
+    from reports import build_report, write_reports
+    start = time.perf_counter()
+    sales = build_report()
+    try:
+        files = write_reports(sales.reports(), format, directory)
+    except ValueError as error:
+        return colored_text(str(error), "error")
+
+    summary = f"{sales.orders} orders reported in {time.perf_counter() - start:.2f}s"
+    return "\n".join([colored_text(summary, "success")] + [f"  - {file}" for file in files])
+
+def stats(file:str="") -> str:
+    """
+    Counters and latencies recorded since the app started. They're also exported in the Prometheus text format,
+    into 'HARVOFFE_METRICS_FILE' ('metrics.prom' by default).
+    """
+    metrics = get_metrics()
+    if not (rows := metrics.summary()):
+        return colored_text("Nothing recorded yet.", "gray")
+
+    file = file or os.environ.get("HARVOFFE_METRICS_FILE", "metrics.prom")
+    try:
+        metrics.export(file)
+        exported = colored_text(f"Exported to '{file}'", "gray")
+    except OSError as error:
+        exported = colored_text(f"Couldn't export the stats to '{file}': {error}", "error")
+    return "\n".join([render_table(rows), exported])
+
+_commands = None
 
-    return tabulate(title_keys(lines), headers="keys", tablefmt="rounded_grid")
+def commands() -> CommandRegistry:
+    """
+    Prompt commands, registered once. Every one of them must be listed in 'shortcuts.csv' (and every prompt command listed there needs a handler here)
+    """
+    global _commands
+    if _commands is None:
+        registry = CommandRegistry("shortcuts.csv")
+        registry.register("--register", User.init_creation_process)
+        registry.register("--authenticate", User.create_session)
+        registry.register("--disconnect", User.close_session)
+        registry.register("--menu", lambda: print(get_menu().table()))
+        registry.register("--order", Order.take)
+        registry.register("--cart", Cart.try_to_open)
+        registry.register("--orderhistory", Order.display_user_orders)
+        # Pickup code or order ID
+        registry.register("--ticket", Order.request_ticket, argument=r"[A-Za-z0-9]{6}|[A-Za-z0-9]{12}")
+        registry.register("--barista", Barista.open)
+        registry.register("--stats", lambda: print(stats()))
+        registry.register("--shortcuts", lambda: print("\nAvailable Shortcuts:", registry.table(), sep="\n\n"))
+        registry.check()
+        _commands = registry
+    return _commands
 
 def prompt():
     while True:
         try:
             prompt = input("Type Here (CTRL + C to exit): ").strip()
 
-            if prompt in ["-r", "--register"]:
-                User.init_creation_process()
-            elif prompt in ["-m", "--menu"]:
-                print(display_table(file="menu.csv"))
-            elif prompt in ["-o", "--order"]:
-                Order.take()
-            elif prompt in ["-auth", "--authenticate"]:
-                User.create_session()
-            elif prompt in ["-dis", "--disconnect"]:
-                User.close_session()
-            elif prompt in ["-c", "--cart"]:
-                Cart.try_to_open()
-            elif prompt in ["-sh", "--shortcuts"]:
-                print("\nAvailable Shortcuts:", display_table(file="shortcuts.csv"), sep="\n\n")
-            elif prompt in ["-oh", "--orderhistory"]:
-                Order.display_user_orders()
-            elif pattern := re.search(r"^(?:-t|--ticket) ([A-Z0-9]{6})$", prompt):
-                Order.request_ticket(pattern.group(1))
+            # Unknown commands are ignored, like they've always been
+            commands().dispatch(prompt)
 
         except (EOFError, KeyboardInterrupt):
+            get_cart_buffer().flush()
             sys.exit(colored_text("\n\nSee you next time!"))
 
 if __name__ == "__main__":
@@ -0,0 +1,57 @@
+import os
+import json
+
+class RenderCache:
+    """
+    Rendered text (banners, tables) saved on disk between runs, so the app doesn't need 'pyfiglet' or 'tabulate' to show
+    something it already rendered before. Every entry carries a 'stamp' (i.e: the source file's modification time and size),
+    and a cached value is only served while the stamp still matches.
+    """
+    def __init__(self, path:str=".harvoffe_cache/render.json"):
+        self.path = path
+        self._entries = None
+
+    def _load(self) -> dict:
+        if self._entries is None:
+            try:
+                with open(self.path, "r") as file:
+                    self._entries = json.load(file)
+            except (OSError, ValueError):
+                # No cache yet (or a corrupted one), start from scratch
+                self._entries = {}
+        return self._entries
+
+    def get(self, key:str, stamp=None) -> str | None:
+        entry = self._load().get(key)
+        if entry is None or entry["stamp"] != stamp:
+            return None
+        return entry["value"]
+
+    def set(self, key:str, value:str, stamp=None) -> None:
+        self._load()[key] = {"stamp": stamp, "value": value}
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Replace the whole file at once, so another terminal never reads half a cache
+            with open(self.path + ".tmp", "w") as file:
+                json.dump(self._entries, file)
+            os.replace(self.path + ".tmp", self.path)
+        except OSError:
+            # Not being able to cache is never worth failing over, it'll just be rendered again next time
+            pass
+
+    @staticmethod
+    def file_stamp(file:str) -> list:
+        """
+        Stamp of a source file: changes whenever the file is edited
+        """
+        stat = os.stat(file)
+        return [stat.st_mtime_ns, stat.st_size]
+
+
+_render_cache = None
+
+def get_render_cache() -> RenderCache:
+    global _render_cache
+    if _render_cache is None:
+        _render_cache = RenderCache(os.path.join(os.environ.get("HARVOFFE_CACHE_DIR", ".harvoffe_cache"), "render.json"))
+    return _render_cache
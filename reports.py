@@ -0,0 +1,134 @@
+import os
+import csv
+import json
+import heapq
+import functools
+from datetime import datetime
+from order_lines import stream_orders
+
+def cents(amount) -> int:
+    """
+    4.75 -> 475. Money is added up in integer cents, so a million orders don't drift
+    """
+    return round(float(amount) * 100)
+
+def money(cents:int) -> str:
+    return f"{cents / 100:.2f}"
+
+@functools.lru_cache(maxsize=4096)
+def to_day(day:str) -> str:
+    """
+    'Nov 03, 2025' -> '2025-11-03'. Cached, since every order of the same day has the same prefix
+    """
+    return datetime.strptime(day, "%b %d, %Y").date().isoformat()
+
+def parse_orders(rows):
+    """
+    Turns stored orders (see 'order_lines.stream_orders') into orders with their day, total in cents and items.
+    Orders that can't be parsed are skipped.
+    """
+    for row in rows:
+        try:
+            # Dates look like 'Nov 03, 2025 19:28:01', the day is always the first 12 characters
+            yield {
+                "card_id": row["card_id"],
+                "client": row["client"],
+                "day": to_day(row["date"][:12]),
+                "total": cents(row["total"]),
+                "items": [(item["coffee"], cents(item["price"]), int(item["quantity"])) for item in row["items"]],
+            }
+        except (KeyError, TypeError, ValueError):
+            continue
+
+class SalesReport:
+    """
+    Sales figures computed in a single pass over the orders. Orders are never kept: memory grows with the number of
+    days, coffees and customers, not with the number of orders.
+    """
+    def __init__(self, top:int=10):
+        self.top = top
+        self.orders = 0
+        self.per_day:dict[str, list[int]] = {}  # day -> [orders, cents]
+        self.per_coffee:dict[str, list[int]] = {}  # coffee -> [quantity, cents]
+        self.per_customer:dict[str, list] = {}  # card_id -> [client, orders, cents]
+        self.basket_sizes:dict[int, int] = {}  # coffees in the order -> orders
+
+    def add(self, order:dict) -> None:
+        self.orders += 1
+
+        day = self.per_day.setdefault(order["day"], [0, 0])
+        day[0] += 1
+        day[1] += order["total"]
+
+        customer = self.per_customer.setdefault(order["card_id"], [order["client"], 0, 0])
+        customer[1] += 1
+        customer[2] += order["total"]
+
+        size = 0
+        for coffee, price, quantity in order["items"]:
+            line = self.per_coffee.setdefault(coffee, [0, 0])
+            line[0] += quantity
+            line[1] += price * quantity
+            size += quantity
+        self.basket_sizes[size] = self.basket_sizes.get(size, 0) + 1
+
+    def consume(self, orders) -> "SalesReport":
+        for order in orders:
+            self.add(order)
+        return self
+
+    def reports(self) -> dict[str, list[dict]]:
+        """
+        Every report as rows, ready to be written as CSV or JSON
+        """
+        return {
+            "revenue_per_day": [
+                {"day": day, "orders": orders, "revenue": money(total)} for day, (orders, total) in sorted(self.per_day.items())
+            ],
+            "revenue_per_coffee": [
+                {"coffee": coffee, "quantity": quantity, "revenue": money(total)}
+                for coffee, (quantity, total) in sorted(self.per_coffee.items(), key=lambda item: -item[1][1])
+            ],
+            "revenue_per_customer": [
+                {"card_id": card_id, "client": client, "orders": orders, "revenue": money(total)}
+                for card_id, (client, orders, total) in sorted(self.per_customer.items(), key=lambda item: -item[1][2])
+            ],
+            "top_sellers": [
+                {"rank": rank, "coffee": coffee, "quantity": quantity}
+                for rank, (coffee, (quantity, _)) in enumerate(heapq.nlargest(self.top, self.per_coffee.items(), key=lambda item: item[1][0]), start=1)
+            ],
+            "basket_sizes": [
+                {"coffees": size, "orders": orders, "share": round(orders / self.orders, 4)} for size, orders in sorted(self.basket_sizes.items())
+            ],
+        }
+
+def build_report(top:int=10) -> SalesReport:
+    """
+    Streams every order from the store through the pipeline: orders and their lines -> parsed orders -> report
+    """
+    return SalesReport(top).consume(parse_orders(stream_orders()))
+
+def write_reports(reports:dict[str, list[dict]], format:str="csv", directory:str="reports") -> list[str]:
+    """
+    Writes one CSV file per report, or a single 'sales.json' with all of them. Returns the files written.
+    """
+    if format not in ["csv", "json"]:
+        raise ValueError(f"Unknown report format '{format}', expected 'csv' or 'json'")
+    os.makedirs(directory, exist_ok=True)
+
+    if format == "json":
+        path = os.path.join(directory, "sales.json")
+        with open(path, "w") as file:
+            json.dump(reports, file, indent=2)
+        return [path]
+
+    paths = []
+    for name, rows in reports.items():
+        path = os.path.join(directory, f"{name}.csv")
+        with open(path, "w", newline="") as file:
+            if rows:
+                writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+        paths.append(path)
+    return paths
@@ -0,0 +1,176 @@
+import sys
+import json
+import asyncio
+import traceback
+from classes.auth import Auth
+from classes.user import User
+from classes.order import Order
+from classes.session import SessionManager
+from classes.order_service import OrderService, OrderError
+from storage import get_storage
+
+class OrderServer:
+    """
+    Serves many kiosks from a single process. Clients connect over TCP and send one JSON request per line:
+
+        {"op": "auth", "email": "...", "password": "..."}    ->  {"ok": true, "token": "..."}
+        {"op": "order", "token": "...", "command": "Macchiato -q 3"}
+        {"op": "cart", "token": "..."}
+        {"op": "pay", "token": "..."}
+        {"op": "history", "token": "...", "page": 1}
+
+    Every response is one JSON line too, with "ok" set to false and an "error" message when the request failed.
+    Sessions and carts live in memory, shared by every connection. bcrypt runs in its worker pool, and the store and files
+    are read and written from worker threads, so a login or a payment never holds up the other kiosks.
+    """
+    def __init__(self):
+        self.sessions = SessionManager()
+        self.carts:dict[str, OrderService] = {}  # card_id -> OrderService, carts stay in memory between requests
+        self.pending_registrations:dict[str, dict] = {}  # email -> user waiting for its verification code
+        self.locks:dict[str, asyncio.Lock] = {}  # card_id -> lock, requests of the same user take turns on its cart
+        self.requests = 0
+
+    async def user(self, request:dict) -> dict:
+        # The session is checked against the store every now and then
+        if (user := await asyncio.to_thread(self.sessions.get, request.get("token", ""))) is None:
+            raise OrderError("Please authenticate (auth) in order to continue.")
+        return user
+
+    async def run(self, user:dict, function, *args, **kwargs):
+        """
+        Runs the blocking 'function' (store, ledger, files) in a worker thread, one request of the user at a time
+        (i.e: two kiosks with the same account paying at once)
+        """
+        async with self.locks.setdefault(user["card_id"], asyncio.Lock()):
+            return await asyncio.to_thread(function, *args, **kwargs)
+
+    def service(self, user:dict) -> OrderService:
+        if (service := self.carts.get(user["card_id"])) is None:
+            service = self.carts[user["card_id"]] = OrderService(user["card_id"])
+        return service
+
+    async def register(self, request:dict) -> dict:
+        email, password = request["email"], request["password"]
+        if not User.EMAIL_PATTERN.search(email):
+            raise OrderError("Invalid email format!")
+        if not await asyncio.to_thread(Auth.check_if_email_is_in_use, email):
+            raise OrderError("It seems you already have an account! (Email is already in use)")
+        if not User.PASSWORD_PATTERN.search(password):
+            raise OrderError("Invalid password.")
+
+        try:
+            # Validates the names
+            User(request["first"], request["last"], email, password)
+        except ValueError as error:
+            raise OrderError(str(error))
+
+        hashed_password = await asyncio.wrap_future(Auth.hash_password_async(password))
+        # The terminal's prompts ('type it below') are for the kiosk, not the server's output
+        if (code := await asyncio.to_thread(Auth.send_verification_code, email, announce=False)) is None:
+            raise OrderError("Couldn't send the verification code, try again later.")
+        self.pending_registrations[email] = {"first": request["first"], "last": request["last"], "password": hashed_password, "code": code}
+        return {"message": "A verification code has been sent to your email, send it back with the 'verify' operation."}
+
+    async def verify(self, request:dict) -> dict:
+        pending = self.pending_registrations.get(request["email"])
+        if pending is None or str(request["code"]) != str(pending["code"]):
+            raise OrderError("Incorrect code.")
+
+        del self.pending_registrations[request["email"]]
+        user = await asyncio.to_thread(User(pending["first"], pending["last"], request["email"], pending["password"]).create, announce=False)
+        if user is None:
+            raise OrderError("Couldn't create your account, try again later.")
+        return {"card_id": str(user["card_id"])}
+
+    async def auth(self, request:dict) -> dict:
+        user = await asyncio.to_thread(get_storage().find_one, "users", "email", request["email"])
+        if user is None or not await asyncio.wrap_future(Auth.check_password_async(request["password"], user["password"])):
+            raise OrderError("Invalid email or password.")
+
+        if Auth.needs_rehash(user["password"]):
+            Auth.rehash_in_background(user["card_id"], request["password"])
+        return {"token": self.sessions.create(user)}
+
+    async def logout(self, request:dict) -> dict:
+        self.sessions.close(request.get("token", ""))
+        return {}
+
+    async def order(self, request:dict) -> dict:
+        user = await self.user(request)
+        service = self.service(user)
+        # Order ('Latte -q 2') and cart ('Latte -d 1') commands
+        await self.run(user, service.execute, request["command"], client=user["first"] + " " + user["last"])
+        return await self.cart(request)
+
+    async def cart(self, request:dict) -> dict:
+        service = self.service(await self.user(request))
+        return {"cart": service.cart.cart, "total": service.cart.get_total()}
+
+    async def pay(self, request:dict) -> dict:
+        user = await self.user(request)
+        order = await self.run(user, self.service(user).pay, client=user["first"] + " " + user["last"])
+        return {"order": order}
+
+    async def history(self, request:dict) -> dict:
+        user = await self.user(request)
+        page = int(request.get("page", 1))
+        return {"orders": await asyncio.to_thread(Order.get_user_orders, user["card_id"], page=page)}
+
+    OPERATIONS = ["register", "verify", "auth", "logout", "order", "cart", "pay", "history"]
+
+    async def handle(self, request:dict) -> dict:
+        self.requests += 1
+        if (op := request.get("op")) not in self.OPERATIONS:
+            return {"ok": False, "error": f"Unknown operation: {op}"}
+        try:
+            return {"ok": True, **await getattr(self, op)(request)}
+        except OrderError as error:
+            return {"ok": False, "error": str(error)}
+        except KeyError as error:
+            return {"ok": False, "error": f"Missing field: {error}"}
+        except (ValueError, TypeError) as error:
+            # i.e: '"page": "two"', or a number where a string was expected
+            return {"ok": False, "error": f"Invalid request: {error}"}
+        except Exception:
+            # A bug, or the disk is full: logged for the developer, and the connection stays open for the next request
+            print(f"Internal error while handling '{op}':\n{traceback.format_exc()}", file=sys.stderr)
+            return {"ok": False, "error": "Internal error, try again later."}
+
+    async def client(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError:
+                    request = None
+
+                if isinstance(request, dict):
+                    response = await self.handle(request)
+                else:
+                    response = {"ok": False, "error": "Requests must be one JSON object per line"}
+                writer.write((json.dumps(response) + "\n").encode("utf-8"))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host:str="127.0.0.1", port:int=8750) -> asyncio.Server:
+        """
+        Starts listening (port 0 picks a free one) and returns the server, clients are served while the loop runs
+        """
+        return await asyncio.start_server(self.client, host, port)
+
+    async def serve(self, host:str="127.0.0.1", port:int=8750) -> None:
+        server = await self.start(host, port)
+        print(f"Harvoffe order server listening on {host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+def serve(address:str="127.0.0.1:8750") -> None:
+    host, port = address.rsplit(":", 1)
+    try:
+        asyncio.run(OrderServer().serve(host, int(port)))
+    except KeyboardInterrupt:
+        pass
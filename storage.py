@@ -0,0 +1,425 @@
+import os
+import csv
+import threading
+from abc import ABC, abstractmethod
+from utils import read_csv, write_csv, append_csv, file_lock
+from csv_index import CSVIndex
+
+# Every table Harvoffe persists, the CSV file backing it, and the columns we look rows up by
+TABLES = {
+    "users": {
+        "file": "users.csv",
+        "headers": ["first", "last", "email", "password", "card_id", "balance"],
+        "indexes": ["card_id", "email"],
+        "unique": ["card_id"],
+    },
+    "carts": {
+        "file": "carts.csv",
+        "headers": ["card_id", "cart"],
+        "indexes": ["card_id"],
+        "unique": ["card_id"],
+    },
+    "orders": {
+        "file": "orders.csv",
+        "headers": ["id", "card_id", "client", "date", "total", "items"],
+        "indexes": ["id", "card_id"],
+        "unique": ["id"],
+        # Rows are only ever appended, lookups seek into the file instead of loading it (see 'CSVStorage')
+        "append_only": True,
+    },
+    # One row per coffee of an order: the menu item it refers to, its unit price in cents and the quantity
+    "order_lines": {
+        "file": "order_lines.csv",
+        "headers": ["order_id", "menu_id", "price_cents", "quantity"],
+        "indexes": ["order_id"],
+        "unique": [],
+        "append_only": True,
+    },
+}
+
+
+def _as_text(value) -> str:
+    """
+    Values are always handed back as strings, exactly like 'read_csv' does, no matter the backend
+    """
+    return "" if value is None else str(value)
+
+
+class Storage(ABC):
+    """
+    Repository API shared by every storage backend. Rows are plain dicts, keyed by the table headers.
+    Backends implement the abstract methods, the others are built on top of them.
+    """
+    @abstractmethod
+    def find(self, table:str, column:str, value) -> list[dict]:
+        raise NotImplementedError
+
+    def find_one(self, table:str, column:str, value) -> dict | None:
+        found = self.find(table, column, value)
+        return found[0] if found else None
+
+    def exists(self, table:str, column:str, value) -> bool:
+        return self.find_one(table, column, value) is not None
+
+    @abstractmethod
+    def all(self, table:str) -> list[dict]:
+        raise NotImplementedError
+
+    def stream(self, table:str):
+        """
+        Yields the rows of the table one at a time, without keeping them in memory (i.e: reports over every order)
+        """
+        yield from self.all(table)
+
+    @abstractmethod
+    def insert(self, table:str, row:dict) -> bool:
+        raise NotImplementedError
+
+    def insert_many(self, table:str, rows:list[dict]) -> bool:
+        """
+        Inserts every row at once (i.e: the lines of an order)
+        """
+        return all(self.insert(table, row) for row in rows)
+
+    @abstractmethod
+    def update(self, table:str, column:str, value, changes:dict) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, table:str, column:str, value) -> int:
+        raise NotImplementedError
+
+
+class CSVStorage(Storage):
+    """
+    Keeps the original CSV files as the source of truth, but loads each one once and serves lookups from in-memory indexes.
+    A table is reloaded only when its file changes on disk (i.e: edited by hand or by another terminal).
+    Writes lock the file and work on a fresh read of it, so several terminals can share the same directory.
+
+    Append-only tables (i.e: 'orders') can grow far beyond what's worth loading: they're never loaded to insert a row,
+    and lookups by an indexed column go through a byte offset index of the file (see 'csv_index.py').
+
+    'update' and 'delete' rewrite the whole file. That's fine for the tables they're used on ('users', 'carts'),
+    which have a row per user; tables that grow with every order are append-only and never rewritten.
+    """
+    def __init__(self, directory:str=""):
+        self.directory = directory
+        self._tables = {}
+        self._offset_indexes = {}
+        # Shared by every thread of the app (i.e: bcrypt workers storing a rehashed password), '_lock' serializes
+        # the use of the in-memory tables. 'file_lock' keeps other terminals out
+        self._lock = threading.RLock()
+
+    def _path(self, table:str) -> str:
+        return os.path.join(self.directory, TABLES[table]["file"])
+
+    def _stamp(self, path:str):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _index(self, table:str, rows:list[dict]) -> dict:
+        indexes = {column: {} for column in TABLES[table]["indexes"]}
+        for position, row in enumerate(rows):
+            for column, index in indexes.items():
+                index.setdefault(row.get(column), []).append(position)
+        return indexes
+
+    def _load(self, table:str, fresh:bool=False) -> dict:
+        path = self._path(table)
+        stamp = self._stamp(path)
+        cached = self._tables.get(table)
+
+        if cached is not None and cached["stamp"] == stamp and not fresh:
+            return cached
+
+        # Stored values never have escaped line breaks, nothing to replace
+        rows = read_csv(path, unescape=[]) if stamp is not None else []
+        cached = {"stamp": stamp, "rows": rows, "indexes": self._index(table, rows)}
+        self._tables[table] = cached
+        return cached
+
+    def _rewrite(self, table:str, rows:list[dict]) -> None:
+        path = self._path(table)
+        write_csv(file=path, rows=rows, headers=TABLES[table]["headers"])
+        self._tables[table] = {"stamp": self._stamp(path), "rows": rows, "indexes": self._index(table, rows)}
+
+    def _offset_index(self, table:str) -> CSVIndex:
+        if table not in self._offset_indexes:
+            self._offset_indexes[table] = CSVIndex(self._path(table), TABLES[table]["indexes"])
+        return self._offset_indexes[table]
+
+    def find(self, table:str, column:str, value) -> list[dict]:
+        value = _as_text(value)
+        with self._lock:
+            if TABLES[table].get("append_only") and column in TABLES[table]["indexes"]:
+                return self._offset_index(table).find(column, value)
+
+            cached = self._load(table)
+
+            if column in cached["indexes"]:
+                positions = cached["indexes"][column].get(value, [])
+                return [dict(cached["rows"][position]) for position in positions]
+
+            # Not an indexed column, fall back to a scan
+            return [dict(row) for row in cached["rows"] if row.get(column) == value]
+
+    def all(self, table:str) -> list[dict]:
+        with self._lock:
+            return [dict(row) for row in self._load(table)["rows"]]
+
+    def stream(self, table:str):
+        # Read straight from the file, the table isn't loaded (nor indexed) for a single pass.
+        # Files are replaced, never rewritten in place, so the open file stays consistent while we read it
+        try:
+            with open(self._path(table), "r", newline="") as file:
+                yield from csv.DictReader(file)
+        except FileNotFoundError:
+            return
+
+    def insert(self, table:str, row:dict) -> bool:
+        headers = TABLES[table]["headers"]
+        path = self._path(table)
+        row = {header: _as_text(row.get(header)) for header in headers}
+        if TABLES[table].get("append_only"):
+            return self._append(table, [row])
+
+        with self._lock, file_lock(path):
+            cached = self._load(table)
+
+            if cached["stamp"] is None:
+                # File doesn't exist yet, write it with its headers
+                self._rewrite(table, [row])
+                return True
+
+            if not append_csv(file=path, row=row, headers=headers):
+                return False
+
+            self._add_to_cache(cached, [row])
+            cached["stamp"] = self._stamp(path)
+        return True
+
+    def insert_many(self, table:str, rows:list[dict]) -> bool:
+        headers = TABLES[table]["headers"]
+        path = self._path(table)
+        rows = [{header: _as_text(row.get(header)) for header in headers} for row in rows]
+        if TABLES[table].get("append_only"):
+            return self._append(table, rows)
+
+        # One lock and one fsync for all the rows
+        with self._lock, file_lock(path):
+            cached = self._load(table)
+
+            if cached["stamp"] is None:
+                self._rewrite(table, rows)
+                return True
+
+            if not append_csv(file=path, row=rows, headers=headers):
+                return False
+
+            self._add_to_cache(cached, rows)
+            cached["stamp"] = self._stamp(path)
+        return True
+
+    def _append(self, table:str, rows:list[dict]) -> bool:
+        """
+        Inserts into an append-only table without loading it. If the table was loaded (i.e: by 'all'),
+        its file changed, so it's read again next time.
+        """
+        path = self._path(table)
+        with self._lock, file_lock(path):
+            if not os.path.exists(path):
+                # File doesn't exist yet, write it with its headers
+                return write_csv(file=path, rows=rows, headers=TABLES[table]["headers"])
+            return append_csv(file=path, row=rows, headers=TABLES[table]["headers"])
+
+    def _add_to_cache(self, cached:dict, rows:list[dict]) -> None:
+        for row in rows:
+            position = len(cached["rows"])
+            cached["rows"].append(row)
+            for column, index in cached["indexes"].items():
+                index.setdefault(row.get(column), []).append(position)
+
+    def _positions(self, cached:dict, column:str, value:str) -> list[int]:
+        if column in cached["indexes"]:
+            return cached["indexes"][column].get(value, [])
+        return [position for position, row in enumerate(cached["rows"]) if row.get(column) == value]
+
+    def update(self, table:str, column:str, value, changes:dict) -> int:
+        value = _as_text(value)
+        with self._lock, file_lock(self._path(table)):
+            cached = self._load(table, fresh=True)
+            if not (positions := self._positions(cached, column, value)):
+                return 0
+
+            rows = [dict(row) for row in cached["rows"]]
+            for position in positions:
+                rows[position].update({key: _as_text(new_value) for key, new_value in changes.items()})
+
+            self._rewrite(table, rows)
+        return len(positions)
+
+    def delete(self, table:str, column:str, value) -> int:
+        value = _as_text(value)
+        with self._lock, file_lock(self._path(table)):
+            cached = self._load(table, fresh=True)
+            kept = [row for row in cached["rows"] if row.get(column) != value]
+            deleted = len(cached["rows"]) - len(kept)
+
+            if deleted:
+                self._rewrite(table, kept)
+        return deleted
+
+
+class SQLiteStorage(Storage):
+    """
+    SQLite backend. Every column is stored as TEXT, so rows look the same as they do with the CSV backend.
+    """
+    def __init__(self, path:str="harvoffe.db"):
+        # 'sqlite3' is only imported when this backend is used
+        import sqlite3
+        self.sqlite3 = sqlite3
+        self.path = path
+        # Wait for other terminals holding a write lock instead of failing right away.
+        # The connection is shared by every thread of the app (i.e: bcrypt workers), '_lock' serializes its use
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        with self._lock, self.connection:
+            for table, schema in TABLES.items():
+                columns = ", ".join(f"{header} TEXT" for header in schema["headers"])
+                self.connection.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns})")
+                for column in schema["indexes"]:
+                    unique = "UNIQUE " if column in schema["unique"] else ""
+                    self.connection.execute(f"CREATE {unique}INDEX IF NOT EXISTS {table}_{column} ON {table} ({column})")
+
+    def _check(self, table:str, *columns:str) -> None:
+        # Table and column names are interpolated into the SQL, so only allow the known ones
+        if table not in TABLES or any(column not in TABLES[table]["headers"] for column in columns):
+            raise ValueError(f"Unknown table or column: {table} {columns}")
+
+    def find(self, table:str, column:str, value) -> list[dict]:
+        self._check(table, column)
+        with self._lock:
+            cursor = self.connection.execute(f"SELECT * FROM {table} WHERE {column} = ? ORDER BY rowid", (_as_text(value),))
+            return [dict(row) for row in cursor]
+
+    def all(self, table:str) -> list[dict]:
+        self._check(table)
+        with self._lock:
+            return [dict(row) for row in self.connection.execute(f"SELECT * FROM {table} ORDER BY rowid")]
+
+    def stream(self, table:str):
+        self._check(table)
+        # A connection of its own, so the shared one isn't locked for as long as the caller takes to go through the rows
+        connection = self.sqlite3.connect(self.path, timeout=30)
+        connection.row_factory = self.sqlite3.Row
+        try:
+            for row in connection.execute(f"SELECT * FROM {table} ORDER BY rowid"):
+                yield dict(row)
+        finally:
+            connection.close()
+
+    def insert(self, table:str, row:dict) -> bool:
+        self._check(table)
+        headers = TABLES[table]["headers"]
+        placeholders = ", ".join("?" for _ in headers)
+        try:
+            with self._lock, self.connection:
+                self.connection.execute(
+                    f"INSERT INTO {table} ({', '.join(headers)}) VALUES ({placeholders})",
+                    [_as_text(row.get(header)) for header in headers]
+                )
+        except self.sqlite3.Error as error:
+            print(f"Internal error: Could not insert into '{table}'.\nSend this to developer: {error}")
+            return False
+        return True
+
+    def insert_many(self, table:str, rows:list[dict]) -> bool:
+        self._check(table)
+        headers = TABLES[table]["headers"]
+        placeholders = ", ".join("?" for _ in headers)
+        try:
+            # A single transaction for all the rows
+            with self._lock, self.connection:
+                self.connection.executemany(
+                    f"INSERT INTO {table} ({', '.join(headers)}) VALUES ({placeholders})",
+                    [[_as_text(row.get(header)) for header in headers] for row in rows]
+                )
+        except self.sqlite3.Error as error:
+            print(f"Internal error: Could not insert into '{table}'.\nSend this to developer: {error}")
+            return False
+        return True
+
+    def update(self, table:str, column:str, value, changes:dict) -> int:
+        self._check(table, column, *changes)
+        assignments = ", ".join(f"{key} = ?" for key in changes)
+        with self._lock, self.connection:
+            cursor = self.connection.execute(
+                f"UPDATE {table} SET {assignments} WHERE {column} = ?",
+                [_as_text(new_value) for new_value in changes.values()] + [_as_text(value)]
+            )
+        return cursor.rowcount
+
+    def delete(self, table:str, column:str, value) -> int:
+        self._check(table, column)
+        with self._lock, self.connection:
+            cursor = self.connection.execute(f"DELETE FROM {table} WHERE {column} = ?", (_as_text(value),))
+        return cursor.rowcount
+
+
+def migrate(source:Storage, target:Storage) -> dict:
+    """
+    One-shot copy of every table from 'source' into 'target' (i.e: the CSV files into SQLite).
+    Rows whose key already exists in 'target' are skipped, so running it twice is harmless.
+    :return: number of rows copied per table
+    :rtype: dict
+    """
+    copied = {}
+    for table, schema in TABLES.items():
+        copied[table] = 0
+        if not schema["unique"]:
+            # Rows can't be told apart (i.e: order lines), so they're only copied into an empty table
+            if not target.all(table):
+                rows = source.all(table)
+                target.insert_many(table, rows)
+                copied[table] = len(rows)
+            continue
+
+        key = schema["unique"][0]
+        for row in source.all(table):
+            if not target.exists(table, key, row[key]):
+                target.insert(table, row)
+                copied[table] += 1
+    return copied
+
+
+_storage = None
+
+def get_storage() -> Storage:
+    """
+    Returns the storage backend in use, chosen with the 'HARVOFFE_STORAGE' env variable ('csv' by default, or 'sqlite').
+    """
+    global _storage
+    if _storage is None:
+        if os.environ.get("HARVOFFE_STORAGE", "csv") == "sqlite":
+            _storage = SQLiteStorage(os.environ.get("HARVOFFE_DB", "harvoffe.db"))
+        else:
+            _storage = CSVStorage()
+    return _storage
+
+def set_storage(storage:Storage) -> None:
+    global _storage
+    _storage = storage
+
+
+if __name__ == "__main__":
+    # Usage: python storage.py [DB_PATH] -> Migrates the CSV files into a SQLite database
+    import sys
+    db_path = sys.argv[1] if len(sys.argv) > 1 else os.environ.get("HARVOFFE_DB", "harvoffe.db")
+    print(migrate(CSVStorage(), SQLiteStorage(db_path)))
@@ -0,0 +1,43 @@
+import time
+import threading
+import audio
+from audio import AudioService, NullBackend
+
+class RecordingBackend(NullBackend):
+    def __init__(self):
+        self.played = []
+        self.thread = None
+
+    def play(self, file_path):
+        self.thread = threading.current_thread()
+        # A slow device shouldn't hold up whoever queued the sound
+        time.sleep(0.2)
+        self.played.append(file_path)
+
+    def speak(self, text):
+        raise RuntimeError("No speech engine")
+
+def test_queued_in_background(monkeypatch):
+    backend = RecordingBackend()
+    monkeypatch.setattr(AudioService, "_build_backend", lambda self: backend)
+
+    service = AudioService()
+    start = time.perf_counter()
+    service.play("sounds/receipt.mp3")
+    service.speak("Thank you!")
+    service.play("sounds/cash_register.mp3")
+    assert time.perf_counter() - start < 0.1
+
+    # Queued audio finishes before the thread ends, a failing backend doesn't stop it
+    service.stop()
+    assert backend.played == ["sounds/receipt.mp3", "sounds/cash_register.mp3"]
+    assert backend.thread is service.thread
+    assert not service.thread.is_alive()
+
+def test_silent(monkeypatch):
+    monkeypatch.setattr(audio, "_audio", None)
+    monkeypatch.setenv("HARVOFFE_AUDIO", "off")
+    service = audio.get_audio()
+    assert isinstance(service._build_backend(), NullBackend)
+    service.play("sounds/receipt.mp3")
+    service.stop()
@@ -0,0 +1,35 @@
+import threading
+from conftest import CARD_ID
+from classes.auth import Auth
+from storage import get_storage
+
+def test_cost(monkeypatch):
+    monkeypatch.setattr(Auth, "BCRYPT_COST", 5)
+    hashed_password = Auth.hash_password("Harvoffe123!")
+    # '$2b$05$...'
+    assert hashed_password.split("$")[2] == "05"
+    assert Auth.check_password_async("Harvoffe123!", hashed_password).result()
+    assert not Auth.needs_rehash(hashed_password)
+
+    monkeypatch.setattr(Auth, "BCRYPT_COST", 6)
+    assert Auth.needs_rehash(hashed_password)
+    # Not a bcrypt hash, nothing to rehash
+    assert not Auth.needs_rehash("hash")
+
+def test_rehash(data_dir, monkeypatch):
+    monkeypatch.setattr(Auth, "BCRYPT_COST", 4)
+    get_storage().update("users", "card_id", CARD_ID, {"password": Auth.hash_password("Harvoffe123!")})
+
+    monkeypatch.setattr(Auth, "BCRYPT_COST", 5)
+    future = Auth.rehash_in_background(CARD_ID, "Harvoffe123!")
+    # Meanwhile, the app keeps reading the store from its own thread
+    readers = [threading.Thread(target=lambda: [get_storage().find_one("users", "card_id", CARD_ID) for _ in range(200)]) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+
+    assert future.result(timeout=30) == get_storage().find_one("users", "card_id", CARD_ID)["password"]
+    stored = get_storage().find_one("users", "card_id", CARD_ID)["password"]
+    assert not Auth.needs_rehash(stored)
+    assert Auth.check_password_async("Harvoffe123!", stored).result()
@@ -0,0 +1,24 @@
+from classes.cart import Cart, CartLine
+
+def test_running_total():
+    cart = Cart("1234", [{"coffee": "Latte", "price": 4.5, "quantity": 2}, {"coffee": "Mocha", "price": 4.95, "quantity": 1}])
+    assert cart.get_total() == 13.95
+
+    # Kept up to date on every change, without float drift
+    for _ in range(10):
+        cart.add("Espresso", 0.1, 1)
+    assert cart.get_total() == 14.95
+    cart.remove("Latte", 2)
+    assert cart.get_total() == 5.95
+    assert "Latte" not in cart.lines
+    assert cart.get_total() == round(sum(line.cents * line.quantity for line in cart.lines.values()) / 100, 2)
+
+    # Same shape as in 'carts.csv'
+    assert cart.cart == [{"coffee": "Mocha", "price": 4.95, "quantity": 1}, {"coffee": "Espresso", "price": 0.1, "quantity": 10}]
+    cart.cart = []
+    assert cart.get_total() == 0
+
+def test_line():
+    line = CartLine("Latte", 4.5, 2)
+    assert line.cents == 450
+    assert not hasattr(line, "__dict__")
@@ -0,0 +1,34 @@
+import os
+import multiprocessing
+from conftest import CARD_ID
+from cart_buffer import CartBuffer
+from order_lines import decode_cart
+from storage import get_storage
+
+OTHER_CARD_ID = "9999888877776666"
+
+def crash(journal:str) -> None:
+    # Runs in its own process: the carts are journaled, then the app dies before any flush (no 'atexit' either)
+    buffer = CartBuffer(journal, flush_interval=3600)
+    buffer.set(CARD_ID, [{"coffee": "Latte", "price": 4.5, "quantity": 2}])
+    buffer.set(OTHER_CARD_ID, [{"coffee": "Espresso", "price": 2.5, "quantity": 1}])
+    buffer.delete(OTHER_CARD_ID)
+    with open(journal, "a") as file:
+        # Killed mid-write
+        file.write('{"card_id": "' + CARD_ID)
+    os._exit(1)
+
+def test_recover_after_crash(data_dir):
+    process = multiprocessing.Process(target=crash, args=("carts.test.journal",))
+    process.start()
+    process.join(timeout=30)
+    assert process.exitcode == 1
+    # Nothing reached the store
+    assert get_storage().find_one("carts", "card_id", CARD_ID) is None
+
+    buffer = CartBuffer("carts.test.journal")
+    # The journal was replayed into the store (half-written line skipped), and emptied
+    assert decode_cart(get_storage().find_one("carts", "card_id", CARD_ID)["cart"]) == [{"coffee": "Latte", "price": 4.5, "quantity": 2}]
+    assert get_storage().find_one("carts", "card_id", OTHER_CARD_ID) is None
+    assert not os.path.exists("carts.test.journal")
+    assert buffer.get(CARD_ID) is None
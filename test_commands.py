@@ -0,0 +1,39 @@
+import os
+import pytest
+from commands import CommandRegistry
+from project import commands
+
+SHORTCUTS = os.path.join(os.path.dirname(__file__), "shortcuts.csv")
+
+def test_registry():
+    registry = CommandRegistry(SHORTCUTS)
+    # Built from 'shortcuts.csv', with the view each command can be typed in
+    assert registry.commands["--menu"].shortcut == "-m"
+    assert registry.commands["--pay"].view == "cart"
+    assert registry.commands["--claim"].view == "barista"
+
+    with pytest.raises(ValueError):
+        registry.register("--coffee", print)
+    # Prompt commands without a handler
+    with pytest.raises(ValueError):
+        registry.check()
+
+def test_dispatch():
+    registry = CommandRegistry(SHORTCUTS)
+    ran = []
+    registry.register("--menu", lambda: ran.append("menu"))
+    registry.register("--ticket", ran.append, argument=r"[A-Za-z0-9]{6}")
+
+    # The command and its shortcut run the same handler
+    assert registry.dispatch("--menu") and registry.dispatch("-m")
+    assert registry.dispatch("-t ABC123")
+    # Arguments must match, commands without one don't take any, and the views' commands aren't prompt commands
+    assert not registry.dispatch("-t ABC")
+    assert not registry.dispatch("-m Latte")
+    assert not registry.dispatch("-p")
+    assert ran == ["menu", "menu", "ABC123"]
+
+def test_app_commands(monkeypatch):
+    monkeypatch.chdir(os.path.dirname(SHORTCUTS))
+    # Every prompt command of 'shortcuts.csv' has its handler in the app
+    commands().check()
@@ -0,0 +1,17 @@
+from csv_index import CSVIndex
+from utils import append_csv, write_csv, find_csv
+
+def test_offset_index(data_dir):
+    headers = ["id", "card_id", "items"]
+    write_csv("orders.csv", [{"id": "A", "card_id": "1", "items": '[{"coffee": "Latte"}]'}, {"id": "B", "card_id": "2", "items": ""}], headers)
+    index = CSVIndex("orders.csv", ["id", "card_id"])
+    assert index.find("id", "A") == [{"id": "A", "card_id": "1", "items": '[{"coffee": "Latte"}]'}]
+
+    # Rows appended by another terminal are found, rows that were already indexed are not read again
+    append_csv("orders.csv", {"id": "C", "card_id": "1", "items": ""}, headers)
+    assert [row["id"] for row in index.find("card_id", "1")] == ["A", "C"]
+    # A rewritten file is indexed from scratch
+    write_csv("orders.csv", [{"id": "D", "card_id": "1", "items": ""}], headers)
+    assert [row["id"] for row in index.find("card_id", "1")] == ["D"]
+    assert index.find("id", "A") == []
+    assert find_csv("orders.csv", "id", "D")["card_id"] == "1"
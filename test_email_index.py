@@ -0,0 +1,14 @@
+from email_index import EmailIndex, BloomFilter
+
+def test_email_index(data_dir):
+    index = EmailIndex("emails.index", BloomFilter("emails.bloom", capacity=1000))
+    # Built from 'users.csv' the first time, and emails are compared in any case
+    assert index.contains("Ignacio.CS50P@gmail.com")
+    assert not index.contains("david@harvard.edu")
+
+    index.add("David@Harvard.edu")
+    # After a restart, the index and the bloom filter are read back from disk
+    restarted = EmailIndex("emails.index", BloomFilter("emails.bloom"))
+    assert restarted.contains("david@harvard.edu")
+    assert "david@harvard.edu" in restarted.bloom
+    assert not restarted.contains("malan@harvard.edu")
@@ -0,0 +1,70 @@
+import os
+import multiprocessing
+import pytest
+import ledger
+from conftest import CARD_ID
+from ledger import Ledger, LedgerError
+from storage import get_storage
+
+PAYERS = 8
+PAYMENTS = 25
+
+def pay(times:int) -> None:
+    # Runs in its own process, like a kiosk would
+    from classes.user import User
+    for _ in range(times):
+        User.update_balance(CARD_ID, 1)
+
+def test_concurrent_payers(data_dir):
+    payers = [multiprocessing.Process(target=pay, args=(PAYMENTS,)) for _ in range(PAYERS)]
+    for payer in payers:
+        payer.start()
+    for payer in payers:
+        payer.join(timeout=60)
+
+    assert all(payer.exitcode == 0 for payer in payers)
+    # No payment was lost, every one of them was discounted
+    assert Ledger().balance(CARD_ID) == (1000 - PAYERS * PAYMENTS) * 100
+
+def test_ledger(data_dir):
+    balances = Ledger(snapshot_every=3)
+    # Accounts are opened from 'users.csv' the first time
+    assert balances.balance(CARD_ID) == 100000
+    balances.debit(CARD_ID, 450, "ABC123")
+    balances.debit(CARD_ID, 1, "ABC124")
+    with pytest.raises(LedgerError):
+        balances.debit(CARD_ID, 100000)
+    assert os.path.exists("ledger.snapshot")
+
+    # After a restart, the snapshot and the lines after it give the same balance
+    balances.debit(CARD_ID, 49, "ABC125")
+    restarted = Ledger()
+    assert restarted.balance(CARD_ID) == 99500
+    assert [entry["cents"] for entry in restarted.history(CARD_ID)] == [100000, -450, -1, -49]
+
+def test_account_opened_lazily(data_dir):
+    balances = Ledger()
+    balances.balance(CARD_ID)
+    # Added to the store after the ledger was built
+    get_storage().insert("users", {"first": "Carter", "last": "Zenke", "email": "carter@cs50.harvard.edu", "password": "hash", "card_id": "9999888877776666", "balance": 12.5})
+    assert balances.balance("9999888877776666") == 1250
+    assert balances.balance("0000000000000000") is None
+    with pytest.raises(LedgerError):
+        balances.debit("0000000000000000", 1)
+
+def test_refund_when_order_fails(data_dir, monkeypatch):
+    from classes.order import Order
+    from classes.order_service import OrderService
+
+    service = OrderService(CARD_ID)
+    service.add_item("Latte", 2)
+
+    def fail(**order):
+        raise OSError("Disk full")
+    monkeypatch.setattr(Order, "create", fail)
+
+    with pytest.raises(OSError):
+        service.pay("Nacho Feijoo")
+    # Charged and refunded, the balance is back where it was
+    assert ledger.get_ledger().balance(CARD_ID) == 100000
+    assert [entry["kind"] for entry in ledger.get_ledger().history(CARD_ID)] == ["opening", "payment", "refund"]
@@ -0,0 +1,68 @@
+import os
+import socket
+import pytest
+from email.message import EmailMessage
+from mailer import Mailer
+
+aiosmtpd = pytest.importorskip("aiosmtpd")
+from aiosmtpd.controller import Controller
+from aiosmtpd.handlers import Sink
+
+
+class Inbox(Sink):
+    """
+    Local SMTP stand-in that keeps every message it receives
+    """
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def smtp_server():
+    inbox = Inbox()
+    controller = Controller(inbox, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    yield controller, inbox
+    controller.stop()
+
+def message(to:str) -> EmailMessage:
+    e_message = EmailMessage()
+    e_message["Subject"] = "Harvoffe Registration Code"
+    e_message["From"] = "harvoffe@example.com"
+    e_message["To"] = to
+    e_message.set_content("Your verification code is: ABC123")
+    return e_message
+
+def test_send_is_queued_and_delivered(smtp_server, tmp_path):
+    controller, inbox = smtp_server
+    mailer = Mailer(controller.hostname, controller.port, use_ssl=False, spool=str(tmp_path))
+
+    for index in range(5):
+        assert mailer.send(message(f"user{index}@example.com"))
+
+    assert mailer.wait(timeout=10)
+    assert sorted(envelope.rcpt_tos[0] for envelope in inbox.messages) == [f"user{index}@example.com" for index in range(5)]
+    # Delivered messages are removed from the spool
+    assert os.listdir(tmp_path) == []
+
+def test_spooled_messages_are_sent_on_next_run(smtp_server, tmp_path):
+    controller, inbox = smtp_server
+
+    # Nothing listens on port 1, so delivery fails and the message stays in the spool
+    offline = Mailer("127.0.0.1", 1, use_ssl=False, spool=str(tmp_path), max_retries=2, backoff=0.01)
+    offline.send(message("late@example.com"))
+    assert offline.wait(timeout=10)
+    assert len(os.listdir(tmp_path)) == 1
+
+    online = Mailer(controller.hostname, controller.port, use_ssl=False, spool=str(tmp_path))
+    assert online.wait(timeout=10)
+    assert [envelope.rcpt_tos[0] for envelope in inbox.messages] == ["late@example.com"]
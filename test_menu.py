@@ -0,0 +1,31 @@
+import os
+from decimal import Decimal
+from classes import menu
+from classes.menu import Menu
+
+def test_reload(data_dir, monkeypatch):
+    reads = []
+    read_csv = menu.read_csv
+    monkeypatch.setattr(menu, "read_csv", lambda file: reads.append(file) or read_csv(file))
+
+    coffees = Menu("menu.csv")
+    assert coffees.get("  flat   WHITE")["coffee"] == "Flat White"
+    assert coffees.get("Latte")["price"] == Decimal("4.50")
+    # Unchanged file, served from memory
+    assert len(reads) == 1
+
+    # Edited in place: new modification time and size
+    with open("menu.csv") as file:
+        content = file.read()
+    with open("menu.csv", "w") as file:
+        file.write(content.replace("Latte,4.50", "Latte,4.75"))
+    assert coffees.get("Latte")["price"] == Decimal("4.75")
+
+    # Replaced by another file with the same size and modification time, only the inode tells them apart
+    stat = os.stat("menu.csv")
+    with open("menu.new.csv", "w") as file:
+        file.write(content.replace("Latte,4.50", "Latte,4.95"))
+    os.utime("menu.new.csv", ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace("menu.new.csv", "menu.csv")
+    assert coffees.get("Latte")["price"] == Decimal("4.95")
+    assert len(reads) == 3
@@ -0,0 +1,37 @@
+import multiprocessing
+from conftest import CARD_ID
+from order_ids import OrderIds
+
+ALLOCATORS = 4
+ALLOCATIONS = 25
+
+def allocate(times:int, queue) -> None:
+    # Every process runs as the same terminal, the worst case
+    ids = OrderIds()
+    queue.put([ids.allocate() for _ in range(times)])
+
+def test_order_ids(data_dir):
+    with open("orders.csv", "w") as file:
+        file.write("id,card_id,client,date,total,items\n")
+        file.write(f"ABC123,{CARD_ID},Nacho Feijoo,\"Nov 03, 2025\",4.5,\n")
+
+    queue = multiprocessing.Queue()
+    allocators = [multiprocessing.Process(target=allocate, args=(ALLOCATIONS, queue)) for _ in range(ALLOCATORS)]
+    for allocator in allocators:
+        allocator.start()
+    # A crashed allocator never puts its IDs, fail instead of waiting forever
+    allocated = [pair for _ in allocators for pair in queue.get(timeout=30)]
+    for allocator in allocators:
+        allocator.join(timeout=30)
+    assert all(allocator.exitcode == 0 for allocator in allocators)
+
+    # No ID nor code was handed out twice, and orders placed before keep their ID as code
+    assert len({order_id for order_id, _ in allocated}) == len({code for _, code in allocated}) == ALLOCATORS * ALLOCATIONS
+    assert "ABC123" not in {code for _, code in allocated}
+
+    ids = OrderIds()
+    order_id, code = ids.allocate()
+    # IDs sort by the time they were allocated, and codes resolve to their order
+    assert order_id > max(order_id for order_id, _ in allocated)
+    assert ids.resolve(code.lower()) == order_id and ids.code(order_id) == code
+    assert ids.resolve("ABC123") == "ABC123"
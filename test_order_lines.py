@@ -0,0 +1,22 @@
+import json
+import storage
+from conftest import CARD_ID
+from classes.order import Order
+from order_lines import encode_cart, decode_cart, get_items, stream_orders
+
+def test_order_lines(data_dir):
+    items = [{"coffee": "Latte", "price": 4.5, "quantity": 2}, {"coffee": "Espresso", "price": 3.0, "quantity": 1}]
+    # Carts are stored in a few bytes per line, and read back the same
+    assert decode_cart(encode_cart(items)) == items
+    assert len(encode_cart(items)) < len(json.dumps(items)) / 2
+    # Carts saved as JSON are still read
+    assert decode_cart(json.dumps(items)) == items
+
+    Order.create("ABC123", CARD_ID, "Nacho Feijoo", "Nov 03, 2025 19:28:01", 12.0, items)
+    order = storage.get_storage().find_one("orders", "id", "ABC123")
+    # No JSON in 'orders.csv', one row per coffee in 'order_lines.csv' with its price in cents
+    assert order["items"] == ""
+    assert [row["price_cents"] for row in storage.get_storage().find("order_lines", "order_id", "ABC123")] == ["450", "300"]
+    assert get_items(order) == items
+    assert [order["items"] for order in stream_orders()] == [items]
+    assert Order.get_user_orders(CARD_ID)[0]["items"] == "Latte (2), Espresso (1)"
@@ -0,0 +1,52 @@
+import os
+import multiprocessing
+from conftest import CARD_ID
+from order_log import OrderLog
+from storage import get_storage
+
+OTHER_CARD_ID = "9999888877776666"
+
+def order(number:int, card_id:str=CARD_ID) -> dict:
+    return {"id": f"ORDER{number:03d}", "card_id": card_id, "client": "Nacho Feijoo", "date": f"Nov {number:02d}, 2025 10:00:00", "total": 4.5, "items": [{"coffee": "Latte", "price": 4.5, "quantity": 1}]}
+
+def test_segments(data_dir):
+    log = OrderLog("order_log", segment_size=500)
+    # Nothing in 'orders.csv', the log starts empty
+    log.rebuild()
+    for number in range(1, 13):
+        log.append(order(number, CARD_ID if number % 3 else OTHER_CARD_ID))
+
+    # Small segments, so the orders were spread over several of them
+    assert len([name for name in os.listdir("order_log") if name.startswith("segment-")]) > 2
+    assert (log.count(CARD_ID), log.count(OTHER_CARD_ID)) == (8, 4)
+    # Latest first, one page at a time
+    assert [entry["id"] for entry in log.get(CARD_ID, page=1, per_page=5)] == ["ORDER011", "ORDER010", "ORDER008", "ORDER007", "ORDER005"]
+    assert [entry["id"] for entry in log.get(CARD_ID, page=2, per_page=5)] == ["ORDER004", "ORDER002", "ORDER001"]
+
+    # Another terminal reads the same log, and sees what this one appends afterwards
+    other = OrderLog("order_log", segment_size=500)
+    assert other.count(OTHER_CARD_ID) == 4
+    log.append(order(13, OTHER_CARD_ID))
+    assert other.get(OTHER_CARD_ID, per_page=1)[0]["id"] == "ORDER013"
+
+def count(queue) -> None:
+    # Runs in its own process, the first use of the log by a terminal
+    queue.put(OrderLog("order_log").count(CARD_ID))
+
+def test_rebuild_once(data_dir):
+    for number in range(1, 21):
+        get_storage().insert("orders", {**order(number), "items": '[{"coffee": "Latte", "price": 4.5, "quantity": 1}]'})
+
+    # Several terminals find no log at the same time, only one of them builds it
+    queue = multiprocessing.Queue()
+    terminals = [multiprocessing.Process(target=count, args=(queue,)) for _ in range(4)]
+    for terminal in terminals:
+        terminal.start()
+    counts = [queue.get(timeout=30) for _ in terminals]
+    for terminal in terminals:
+        terminal.join(timeout=30)
+
+    assert counts == [20] * 4
+    assert OrderLog("order_log").count(CARD_ID) == 20
+    with open(os.path.join("order_log", "index.log")) as file:
+        assert len(file.readlines()) == 20
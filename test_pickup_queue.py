@@ -0,0 +1,40 @@
+import os
+import shutil
+import pytest
+from classes import menu
+from pickup_queue import PickupQueue, QueueError
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    shutil.copy(os.path.join(os.path.dirname(__file__), "menu.csv"), tmp_path)
+    monkeypatch.chdir(tmp_path)
+    # Preparation times are read from the 'menu.csv' of this directory
+    monkeypatch.setattr(menu, "_menu", None)
+    return PickupQueue("pickup_queue.log")
+
+def test_claim_order(queue):
+    queue.add("ORDER1", "AAAAAA", "Nacho Feijoo", [{"coffee": "Frappe", "quantity": 3}])
+    queue.add("ORDER2", "BBBBBB", "David Malan", [{"coffee": "Espresso", "quantity": 1}])
+    queue.add("ORDER3", "CCCCCC", "Carter Zenke", [{"coffee": "Latte", "quantity": 1}])
+
+    # The quick espresso is ready long before the three frappes placed a moment earlier
+    assert [order["id"] for order in queue.waiting()] == ["ORDER2", "ORDER3", "ORDER1"]
+    assert queue.claim(barista="bar-1")["id"] == "ORDER2"
+    assert queue.claim("ORDER1", barista="bar-2")["id"] == "ORDER1"
+    with pytest.raises(QueueError):
+        queue.claim("ORDER1")
+    # Claimed orders are skipped, even though they're still in the heap
+    assert queue.claim()["id"] == "ORDER3"
+    with pytest.raises(QueueError):
+        queue.claim()
+
+    queue.complete("ORDER2")
+    with pytest.raises(QueueError):
+        queue.complete("ORDER2")
+
+    # Another terminal reads the same queue from the log
+    other = PickupQueue("pickup_queue.log")
+    assert [order["id"] for order in other.in_progress()] == ["ORDER1", "ORDER3"]
+    stats = other.stats()
+    assert (stats["queued"], stats["in_progress"], stats["orders_per_hour"]) == (0, 2, 1.0)
+    assert stats["wait_p95_s"] < 5
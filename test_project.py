@@ -1,11 +1,19 @@
+import os
 import pytest
+import tempfile
 from pyfiglet import FontNotFound
-from project import banner, display_table, prompt
+from conftest import CARD_ID
+from project import banner, display_table, prompt, stats, replay
+from utils import read_csv
+from storage import get_storage
+from ledger import get_ledger
+from order_lines import from_rows
 
 def main():
     test_banner()
     test_display_table()
     test_prompt()
+    test_stats()
 
 def test_banner():
     # Type or returned value
@@ -37,5 +45,27 @@ def test_prompt():
     with pytest.raises(TypeError):
         prompt("Testing")
 
+def test_stats():
+    # Reading a CSV is recorded, and shows up in the stats and in the Prometheus export
+    read_csv("menu.csv")
+    with tempfile.TemporaryDirectory() as directory:
+        file = os.path.join(directory, "metrics.prom")
+        assert isinstance(stats(file), str)
+        with open(file) as exported:
+            assert "harvoffe_read_csv_seconds_count" in exported.read()
+
+def test_replay(data_dir):
+    with open("orders.txt", "w") as file:
+        file.write(f"# Two orders and a typo\n-u {CARD_ID}\nLatte -q 2\nEspresso\n-p\n\nLatte -q 1\nLatte -a 2\nLate -q 1\n-p\n")
+    summary = replay("orders.txt")
+    assert "2 orders placed" in summary and "1 errors" in summary and "Line 9" in summary
+
+    # Both orders were saved with their lines, and charged to the user
+    orders = get_storage().find("orders", "card_id", CARD_ID)
+    assert [order["total"] for order in orders] == ["12.0", "13.5"]
+    assert from_rows(get_storage().find("order_lines", "order_id", orders[1]["id"])) == [{"coffee": "Latte", "price": 4.5, "quantity": 3}]
+    assert get_ledger().balance(CARD_ID) == 100000 - 1200 - 1350
+    assert [entry["reference"] for entry in get_ledger().history(CARD_ID)[1:]] == [order["id"] for order in orders]
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
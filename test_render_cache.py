@@ -0,0 +1,28 @@
+import os
+from render_cache import RenderCache
+
+def test_invalidation(tmp_path):
+    source = tmp_path / "menu.csv"
+    source.write_text("coffee,price\nLatte,4.50\n")
+    path = str(tmp_path / "cache" / "render.json")
+
+    cache = RenderCache(path)
+    stamp = cache.file_stamp(source)
+    assert cache.get("menu", stamp) is None
+    cache.set("menu", "<table>", stamp)
+
+    # Another run reads it from disk, while the source file is unchanged
+    assert RenderCache(path).get("menu", RenderCache.file_stamp(source)) == "<table>"
+
+    source.write_text("coffee,price\nLatte,4.75\nMocha,4.95\n")
+    assert RenderCache(path).get("menu", RenderCache.file_stamp(source)) is None
+
+def test_corrupted(tmp_path):
+    path = tmp_path / "render.json"
+    path.write_text("{not json")
+    # Rendered again, and the cache is written over
+    cache = RenderCache(str(path))
+    assert cache.get("banner") is None
+    cache.set("banner", "HARVOFFE")
+    assert RenderCache(str(path)).get("banner") == "HARVOFFE"
+    assert not os.path.exists(str(path) + ".tmp")
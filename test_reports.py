@@ -0,0 +1,60 @@
+import json
+import pytest
+from storage import CSVStorage, set_storage
+from reports import build_report, write_reports
+
+ORDERS = [
+    ("A00001", "card-1", "Nacho Feijoo", "Nov 03, 2025 19:28:01", 13.75, [("Macchiato", 4.75, 1), ("Americano", 3.5, 1), ("Frappe", 5.5, 1)]),
+    ("A00002", "card-1", "Nacho Feijoo", "Nov 03, 2025 20:00:00", 9.5, [("Macchiato", 4.75, 2)]),
+    ("A00003", "card-2", "David Malan", "Nov 04, 2025 08:15:00", 3.5, [("Americano", 3.5, 1)]),
+]
+
+@pytest.fixture
+def orders(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    set_storage(CSVStorage())
+    storage = CSVStorage()
+    for id, card_id, client, date, total, items in ORDERS:
+        items = json.dumps([{"coffee": coffee, "price": price, "quantity": quantity} for coffee, price, quantity in items])
+        storage.insert("orders", {"id": id, "card_id": card_id, "client": client, "date": date, "total": total, "items": items})
+    # A broken row is skipped instead of breaking the report
+    with open("orders.csv", "a") as file:
+        file.write('A00004,card-2,David Malan,"Nov 04, 2025 09:00:00",4.5,not json\n')
+    yield tmp_path
+    set_storage(None)
+
+def test_report(orders):
+    sales = build_report()
+    reports = sales.reports()
+
+    assert sales.orders == 3
+    assert reports["revenue_per_day"] == [
+        {"day": "2025-11-03", "orders": 2, "revenue": "23.25"},
+        {"day": "2025-11-04", "orders": 1, "revenue": "3.50"},
+    ]
+    assert reports["top_sellers"][0] == {"rank": 1, "coffee": "Macchiato", "quantity": 3}
+    assert reports["revenue_per_customer"][0]["revenue"] == "23.25"
+    assert [row["coffees"] for row in reports["basket_sizes"]] == [1, 2, 3]
+
+def test_write_reports(orders):
+    files = write_reports(build_report().reports(), "csv", "reports")
+    assert len(files) == 5
+
+    with open(write_reports(build_report().reports(), "json", "reports")[0]) as file:
+        assert json.load(file)["revenue_per_coffee"][0]["coffee"] == "Macchiato"
+
+    with pytest.raises(ValueError):
+        write_reports({}, "xml")
+
+def test_columnar_matches_report(orders):
+    pytest.importorskip("numpy")
+    from columnar import compact, OrderColumns
+
+    assert compact() == 5
+    columns = OrderColumns().reports()
+    reports = build_report().reports()
+    # Same figures as the row by row reports, without parsing a single JSON
+    assert columns["revenue_per_day"] == reports["revenue_per_day"]
+    assert columns["revenue_per_coffee"] == reports["revenue_per_coffee"]
+    assert columns["top_customers"][0] == {"card_id": "card-1", "revenue": "23.25"}
+    assert OrderColumns().reports(since="2025-11-04")["revenue_per_day"] == [{"day": "2025-11-04", "orders": 1, "revenue": "3.50"}]
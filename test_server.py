@@ -0,0 +1,49 @@
+import json
+import asyncio
+from conftest import CARD_ID
+from classes.auth import Auth
+from storage import get_storage
+from ledger import get_ledger
+from server import OrderServer
+
+async def round_trip(requests:list[dict]) -> list[dict]:
+    server = await OrderServer().start("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+
+    responses = []
+    token = None
+    for request in requests:
+        # Every request after the login carries its token
+        writer.write((json.dumps({**request, "token": token} if token else request) + "\n").encode("utf-8"))
+        await writer.drain()
+        responses.append(json.loads(await asyncio.wait_for(reader.readline(), timeout=30)))
+        token = token or responses[-1].get("token")
+
+    writer.close()
+    await writer.wait_closed()
+    # Let the server see the connection closed before it shuts down
+    await asyncio.sleep(0.1)
+    server.close()
+    await server.wait_closed()
+    return responses
+
+def test_round_trip(data_dir, monkeypatch):
+    monkeypatch.setattr(Auth, "BCRYPT_COST", 4)
+    get_storage().update("users", "card_id", CARD_ID, {"password": Auth.hash_password("Harvoffe123!")})
+
+    auth, order, bad, cart, pay, history = asyncio.run(round_trip([
+        {"op": "auth", "email": "ignacio.cs50p@gmail.com", "password": "Harvoffe123!"},
+        {"op": "order", "command": "Latte -q 2"},
+        # A bad request gets an error, and the connection is still usable
+        {"op": "history", "page": "two"},
+        {"op": "cart"},
+        {"op": "pay"},
+        {"op": "history"},
+    ]))
+
+    assert auth["ok"] and order["ok"] and cart["ok"] and pay["ok"] and history["ok"]
+    assert order["cart"] == cart["cart"] == [{"coffee": "Latte", "price": 4.5, "quantity": 2}]
+    assert not bad["ok"]
+    assert [entry["id"] for entry in history["orders"]] == [pay["order"]["id"]]
+    assert get_ledger().balance(CARD_ID) == 100000 - round(pay["order"]["total"] * 100)
@@ -0,0 +1,42 @@
+import json
+import time
+from conftest import CARD_ID
+from classes.session import SessionManager
+from storage import get_storage
+
+def test_expiry(data_dir, monkeypatch):
+    user = get_storage().find_one("users", "card_id", CARD_ID)
+    sessions = SessionManager(ttl=60)
+    token = sessions.start(user)
+    assert sessions.get(token)["email"] == "ignacio.cs50p@gmail.com"
+
+    # One minute later the session is gone, from memory and from 'session.json'
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 60)
+    assert sessions.get(token) is None
+    assert sessions.current() is None
+    assert json.load(open("session.json")) == {}
+
+def test_terminals(data_dir):
+    user = get_storage().find_one("users", "card_id", CARD_ID)
+    kiosk, counter = SessionManager(terminal="kiosk"), SessionManager(terminal="counter")
+    kiosk.start(user)
+    counter.start(user)
+
+    # Each terminal keeps its own session in the shared file, and gets it back after a restart
+    assert set(json.load(open("session.json"))) == {"kiosk", "counter"}
+    assert SessionManager(terminal="kiosk").current()["card_id"] == CARD_ID
+
+    # Logging out of one terminal leaves the other one logged in
+    kiosk.close_current()
+    assert SessionManager(terminal="kiosk").current() is None
+    assert SessionManager(terminal="counter").current()["card_id"] == CARD_ID
+    # Nothing but the token, the card and the expiration time is saved
+    assert set(json.load(open("session.json"))["counter"]) == {"token", "card_id", "expires_at"}
+
+def test_deleted_user(data_dir):
+    sessions = SessionManager(revalidate_after=0)
+    token = sessions.create(get_storage().find_one("users", "card_id", CARD_ID))
+    get_storage().delete("users", "card_id", CARD_ID)
+    # The user is checked against the store again, and it doesn't exist anymore
+    assert sessions.get(token) is None
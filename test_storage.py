@@ -0,0 +1,24 @@
+import os
+import pytest
+from conftest import CARD_ID
+from storage import Storage, CSVStorage
+
+def test_write_is_atomic(data_dir):
+    csv_storage = CSVStorage()
+    csv_storage.update("users", "card_id", CARD_ID, {"balance": 10})
+
+    # No temporary file is left behind, and the file is complete
+    assert [name for name in os.listdir(data_dir) if name.startswith(".tmp-")] == []
+    assert CSVStorage().find_one("users", "card_id", CARD_ID)["balance"] == "10"
+
+def test_backends_implement_the_api():
+    class ReadOnlyStorage(Storage):
+        def find(self, table, column, value):
+            return []
+
+        def all(self, table):
+            return []
+
+    # 'insert', 'update' and 'delete' are missing
+    with pytest.raises(TypeError):
+        ReadOnlyStorage()
@@ -1,13 +1,14 @@
-import warnings
-warnings.filterwarnings(action="ignore", module="pygame.pkgdata")
-from os import environ
-environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
-
+import os
 import csv
-import smtplib
-from email.message import EmailMessage
-import pygame
-import pyttsx3 
+import threading
+from contextlib import contextmanager
+from metrics import timed
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks on this platform (i.e: Windows), locking only works between threads
+    fcntl = None
 
 def colored_text(text: str, color_key: str="") -> str:
     """Returns text wrapped in ANSI escape codes for color."""
@@ -25,34 +26,98 @@ def colored_text(text: str, color_key: str="") -> str:
 
     return ansi_color + text + RESET
 
-def read_csv(file:str) -> list:
-    lines:list = []
+def iter_csv(file:str, unescape:list[str] | None=None):
+    """
+    Yields the rows of 'file' one at a time, so callers that only need the first matching row stop reading there.
+    Only the 'unescape' columns get their '\\n' replaced (every column if not given). Data files like 'orders.csv'
+    never have escaped line breaks, so the stores pass an empty list and skip the replace altogether.
+    """
     with open(file, "r", newline="") as file:
         reader = csv.DictReader(file)
+        if unescape is None:
+            unescape = reader.fieldnames or []
         for row in reader:
             # Replace all '\n' in the CSV for actual line breaks. If we don't do this, line breaks added in the CSV are not recognized as line breaks
-            row = {key: value.replace("\\n", "\n") for key, value in row.items()}
-            lines.append(row)
+            for key in unescape:
+                if (value := row.get(key)) and "\\" in value:
+                    row[key] = value.replace("\\n", "\n")
+            yield row
+
+@timed("read_csv")
+def read_csv(file:str, unescape:list[str] | None=None) -> list:
+    return list(iter_csv(file, unescape))
+
+def find_csv(file:str, column:str, value:str, unescape:list[str] | None=None) -> dict | None:
+    """
+    First row of 'file' where 'column' == 'value', the rest of the file isn't read
+    """
+    return next((row for row in iter_csv(file, unescape) if row[column] == value), None)
 
-    return lines
+_file_locks:dict = {}
+_file_locks_guard = threading.Lock()
 
+@contextmanager
+def file_lock(file:str):
+    """
+    Exclusive lock around a read-modify-write of 'file', shared by every thread and every terminal using the same directory.
+    It's re-entrant, so a function holding the lock can call others that take it too (i.e: 'write_csv').
+    The lock is taken on a '<file>.lock' sidecar, since 'file' itself gets replaced on every write.
+    """
+    path = os.path.abspath(file)
+    with _file_locks_guard:
+        lock = _file_locks.setdefault(path, {"thread_lock": threading.RLock(), "depth": 0, "handle": None})
+
+    with lock["thread_lock"]:
+        if lock["depth"] == 0 and fcntl is not None:
+            lock["handle"] = open(path + ".lock", "a")
+            fcntl.flock(lock["handle"], fcntl.LOCK_EX)
+        lock["depth"] += 1
+        try:
+            yield
+        finally:
+            lock["depth"] -= 1
+            if lock["depth"] == 0 and lock["handle"] is not None:
+                fcntl.flock(lock["handle"], fcntl.LOCK_UN)
+                lock["handle"].close()
+                lock["handle"] = None
+
+@timed("write_csv")
 def write_csv(file:str, rows:list[dict], headers:list[str]) -> bool:
+    """
+    Rewrites 'file' atomically: rows are written into a temporary file that replaces 'file' only once it's fully on disk,
+    so a crash mid-write never leaves a truncated CSV behind.
+    """
+    import tempfile
+    temp_path = None
     try:
-        with open(file, "w") as file:
-            writer = csv.DictWriter(file, fieldnames=headers)
-            writer.writeheader()
-            writer.writerows(rows)
+        with file_lock(file):
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file)), prefix=".tmp-", suffix=".csv")
+            with open(fd, "w", newline="") as temp_file:
+                writer = csv.DictWriter(temp_file, fieldnames=headers)
+                writer.writeheader()
+                writer.writerows(rows)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+            os.replace(temp_path, file)
     except Exception as error:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
         print(f"Internal error: Could not write into '{file}'.\nSend this to developer: {error}")
         return False
     else:
         return True
     
-def append_csv(file:str, row:list[dict], headers:list[str]) -> bool:
+@timed("append_csv")
+def append_csv(file:str, row:dict | list[dict], headers:list[str]) -> bool:
+    """
+    Appends a row (or a list of rows, written with a single fsync) at the end of 'file'
+    """
     try:
-        with open(file, "a") as file:
+        with file_lock(file), open(file, "a") as file:
             writer = csv.DictWriter(file, fieldnames=headers)
-            writer.writerow(row)
+            writer.writerows(row if isinstance(row, list) else [row])
+            file.flush()
+            os.fsync(file.fileno())
     except Exception as error:
         print(f"Internal error: Could not append into '{file}'.\nSend this to developer: {error}")
         return False
@@ -60,41 +125,46 @@ def append_csv(file:str, row:list[dict], headers:list[str]) -> bool:
         return True
     
 def play_sound(file_path:str="") -> None:
-    pygame.mixer.init()
-    pygame.mixer.music.load(file_path)
-    pygame.mixer.music.play()
+    """
+    Queues the sound in the audio service (see 'audio.py') and returns right away
+    """
+    from audio import get_audio
+    get_audio().play(file_path)
 
 def speak(text:str=""):
-    engine = pyttsx3.init()
-    engine.setProperty('rate', 150)  # Words per minute
-    engine.say(text)
-    engine.runAndWait()
-    engine.stop()
+    """
+    Queues the text to be spoken by the audio service and returns right away
+    """
+    from audio import get_audio
+    get_audio().speak(text)
 
+@timed("send_email")
 def send_email(message) -> bool:
-    
-    credentials = {
-        "SENDER_EMAIL": "[YOUR GMAIL ADDRESS]",
-        "SENDER_PASSWORD": "[YOUR APP PASSWORD]"
-    }
+    """
+    Queues the email for delivery (see 'mailer.py'), so the prompt doesn't wait for the SMTP server.
+    Server and credentials come from the 'HARVOFFE_SMTP_*' env variables (GMail's SMTP server by default).
+    """
+    # Imported here, 'mailer' starts its delivery workers the first time it's used
+    from email.message import EmailMessage
+    from mailer import get_mailer
     
     e_message = EmailMessage()
     e_message["Subject"] = message["Subject"]
     e_message["To"] = message["To"]
     e_message.set_content(message["Body"])
 
-    try:
-        # Use GMail's SMTP server (port 587 for TLS)
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server:
-            server.login(credentials["SENDER_EMAIL"], credentials["SENDER_PASSWORD"])
-            server.send_message(e_message)
-            
-    except Exception as error:
-        print(colored_text(f"Internal error: Couldn't send email to user. Send this error to the developer: {error}", "error"))
+    if not get_mailer().send(e_message):
+        print(colored_text("Internal error: Couldn't send email to user. Send this error to the developer: the email could not be queued", "error"))
         return False
-    else:
-        return True
+    return True
     
+def render_table(data:list[dict]) -> str:
+    """
+    Renders the rows as a table with titled headers. 'tabulate' is only imported the first time a table is rendered.
+    """
+    from tabulate import tabulate
+    return tabulate(title_keys(data), headers="keys", tablefmt="rounded_grid")
+
 def title_keys(data:list[dict]):
     titled_data = []
 